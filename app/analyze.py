@@ -1,36 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
 import pandas as pd
 import json
 import os
+import hmac
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
 from app.crm import SessionLocal, Conversation
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import uuid
+from app.charts import (
+    generate_chart, chart_media_type, CHART_FORMATS,
+    DEFAULT_CHART_DPI, MIN_CHART_DPI, MAX_CHART_DPI
+)
+from app.export import stream_export, pyarrow_available, EXPORT_FORMATS, DEFAULT_EXPORT_CHUNK_ROWS
+from app.artifacts import artifact_store
+from app.context_budget import count_tokens, fit_json_records, SUMMARY_SAMPLE_TOKENS
+from app.response_cache import normalize_question
+from app.single_flight import SingleFlight
+from app.llm_gateway import LLMOverloaded
+from app.llm import complete
+from app.dataset import (
+    get_dataset, reload_dataset, clean_dataframe, filter_dataframe,
+    parse_percentile, NUMERIC_COLUMNS, SIMPLE_AGGREGATIONS
+)
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
 
-# Initialize OpenAI client (consistent with existing chat.py)
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
-
 analyze_router = APIRouter()
 
-# Load the property dataset once
-CSV_PATH = "data/HackathonInternalKnowledgeBase.csv"
-try:
-    df = pd.read_csv(CSV_PATH)
-    print(f"Loaded {len(df)} properties from {CSV_PATH}")
-except Exception as e:
-    print(f"Error loading CSV: {e}")
-    df = pd.DataFrame()
+# Shared secret for admin endpoints (sent as the X-Admin-Token header); they are disabled without it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 # Dependency to get DB session
 def get_db():
@@ -45,6 +47,8 @@ class AnalyzeRequest(BaseModel):
     query: str
     return_chart: bool = False
     download_csv: bool = False
+    chart_format: str = "png"
+    chart_dpi: int = DEFAULT_CHART_DPI
 
 class AnalyzeResponse(BaseModel):
     summary: str
@@ -53,17 +57,41 @@ class AnalyzeResponse(BaseModel):
     query_interpretation: str
     chart_url: str = ""
     csv_url: str = ""
+    # Prompt tokens sent to the LLM for this request
+    usage: Dict[str, int] = {}
+    # True when the result was shared from an identical request already in progress
+    coalesced: bool = False
+
+class AggregateRequest(BaseModel):
+    group_by: List[str] = []
+    metrics: Dict[str, List[str]]
+    filters: Dict[str, Dict[str, float]] = {}
+    sort_by: Optional[str] = None
+    descending: bool = True
+    limit: int = 100
+
+class ExportRequest(BaseModel):
+    user_id: str
+    query: Optional[str] = None
+    filters: Optional[Dict[str, Dict[str, float]]] = None
+    format: str = "csv"
+    chunk_rows: int = DEFAULT_EXPORT_CHUNK_ROWS
+
+class AggregateResponse(BaseModel):
+    groups: List[Dict[str, Any]]
+    total_groups: int
+    dataset_version: int
+    cached: bool = False
 
-def call_openai(prompt: str) -> str:
-    """Call OpenAI API with error handling"""
+def call_llm(prompt: str, purpose: str, query: str) -> str:
+    """Call the configured LLM backend with error handling (LLMOverloaded passes through as a 503)"""
     try:
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return completion.choices[0].message.content.strip()
+        completion = complete([{"role": "user", "content": prompt}], purpose, query)
+        return completion.text.strip()
+    except LLMOverloaded:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"LLM API error: {str(e)}")
 
 def clean_currency_string(value: str) -> float:
     """Clean currency strings and convert to float"""
@@ -114,13 +142,15 @@ Respond only with valid JSON, no additional text.
 """
     
     try:
-        filter_json_str = call_openai(filter_prompt)
+        filter_json_str = call_llm(filter_prompt, "filters", query)
         # Clean the response to ensure it's valid JSON
         filter_json_str = filter_json_str.strip()
         if filter_json_str.startswith('```json'):
             filter_json_str = filter_json_str.replace('```json', '').replace('```', '').strip()
         
         return json.loads(filter_json_str)
+    except LLMOverloaded:
+        raise
     except json.JSONDecodeError as e:
         print(f"JSON parsing error: {e}")
         return {}
@@ -133,39 +163,42 @@ def apply_filters(df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
     if df.empty:
         return df
     
-    # Create a copy to avoid modifying the original
-    filtered_df = df.copy()
-    
-    # Clean numeric columns
-    filtered_df['Size (SF)'] = pd.to_numeric(filtered_df['Size (SF)'], errors='coerce')
-    filtered_df['Rent/SF/Year'] = filtered_df['Rent/SF/Year'].apply(clean_currency_string)
-    filtered_df['GCI On 3 Years'] = filtered_df['GCI On 3 Years'].apply(clean_currency_string)
-    
-    # Apply filters
-    for column, conditions in filters.items():
-        if column not in filtered_df.columns:
-            continue
-            
-        for operator, value in conditions.items():
-            if operator == 'gt':
-                filtered_df = filtered_df[filtered_df[column] > value]
-            elif operator == 'lt':
-                filtered_df = filtered_df[filtered_df[column] < value]
-            elif operator == 'eq':
-                filtered_df = filtered_df[filtered_df[column] == value]
-            elif operator == 'gte':
-                filtered_df = filtered_df[filtered_df[column] >= value]
-            elif operator == 'lte':
-                filtered_df = filtered_df[filtered_df[column] <= value]
-    
-    return filtered_df
+    return filter_dataframe(clean_dataframe(df), filters)
+
+# Results keyed by (dataset version, normalized request); oldest entries are evicted first
+AGGREGATE_CACHE_SIZE = 128
+aggregate_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+def validate_aggregate_request(request: AggregateRequest, columns: List[str]):
+    """Raise a 400 if the request references unknown columns or operations"""
+    for column in request.group_by:
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"Unknown group_by column: {column}")
+    if not request.metrics:
+        raise HTTPException(status_code=400, detail="At least one metric is required")
+    for column, operations in request.metrics.items():
+        if column not in NUMERIC_COLUMNS or column not in columns:
+            raise HTTPException(status_code=400, detail=f"Column is not numeric: {column}")
+        for operation in operations:
+            if operation not in SIMPLE_AGGREGATIONS and parse_percentile(operation) is None:
+                raise HTTPException(status_code=400, detail=f"Unsupported aggregation: {operation}")
+    if request.limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
+def dataframe_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a frame to JSON-safe records (NaN becomes None, numpy scalars become Python)"""
+    return frame.astype(object).where(pd.notna(frame), None).to_dict(orient='records')
 
 def format_currency(value: float) -> str:
     """Format a number as currency"""
     return f"${value:,.2f}"
 
-def generate_summary(matches: List[Dict[str, Any]], query: str) -> str:
-    """Generate a summary of the matches using OpenAI"""
+def generate_summary(matches: List[Dict[str, Any]], query: str, usage: Optional[Dict[str, int]] = None) -> str:
+    """Generate a summary of the matches with the LLM.
+
+    Sample properties are sent as compact JSON capped at SUMMARY_SAMPLE_TOKENS;
+    prompt size is recorded in usage when given.
+    """
     if not matches:
         return "No properties match your criteria."
     
@@ -178,6 +211,7 @@ def generate_summary(matches: List[Dict[str, Any]], query: str) -> str:
         "avg_gci": sum(m.get('GCI On 3 Years', 0) if isinstance(m.get('GCI On 3 Years'), (int, float)) else 0 for m in matches) / len(matches) if matches else 0
     }
     
+    sample_json, sample_count = fit_json_records(summary_data['sample_properties'], SUMMARY_SAMPLE_TOKENS)
     summary_prompt = f"""
 Based on the user query: "{query}"
 
@@ -188,55 +222,30 @@ Average Rent: ${summary_data['avg_rent']:.2f}/SF/Year
 Average GCI (3 years): ${summary_data['avg_gci']:.2f}
 
 Sample properties:
-{json.dumps(summary_data['sample_properties'], indent=2)}
+{sample_json}
 
 Please provide a concise, professional summary of these findings for an investor or broker. Focus on the key metrics and trends.
 """
+    if usage is not None:
+        usage["summary_prompt_tokens"] = count_tokens(summary_prompt)
+        usage["summary_sample_properties"] = sample_count
     
     try:
-        return call_openai(summary_prompt)
+        return call_llm(summary_prompt, "summary", query)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         return f"Found {len(matches)} properties matching your criteria. Analysis details: {str(e)}"
 
-def generate_chart(filtered_df: pd.DataFrame, user_id: str) -> str:
-    """Generate a chart from filtered data and return the URL"""
-    if filtered_df.empty:
-        return ""
-    
-    try:
-        # Create a visualization
-        plt.figure(figsize=(12, 8))
-        
-        # Get top 10 properties by GCI
-        top_properties = filtered_df.nlargest(10, 'GCI On 3 Years')
-        
-        # Create labels for properties
-        labels = []
-        for _, row in top_properties.iterrows():
-            address = str(row.get('Property Address', 'Unknown'))[:30]
-            suite = str(row.get('Suite', ''))
-            if suite and suite != 'nan':
-                labels.append(f"{address} - {suite}")
-            else:
-                labels.append(address)
-        
-        # Create horizontal bar chart
-        plt.barh(range(len(labels)), top_properties['GCI On 3 Years'])
-        plt.yticks(range(len(labels)), labels)
-        plt.xlabel('GCI On 3 Years ($)')
-        plt.title('Top 10 Properties by GCI (3 Years)')
-        plt.tight_layout()
-        
-        # Save the chart
-        chart_filename = f"chart_{user_id}_{uuid.uuid4().hex}.png"
-        chart_path = f"data/{chart_filename}"
-        plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        return f"/analyze/download_chart/{chart_filename}"
-    except Exception as e:
-        print(f"Error generating chart: {e}")
-        return ""
+# Identical portfolio analyses in progress, keyed by dataset version, normalized query and options
+analysis_flights = SingleFlight()
+
+def analysis_key(request: AnalyzeRequest, dataset_version: int) -> tuple:
+    """Requests with the same key get the same analysis whoever sends them"""
+    return (
+        dataset_version, normalize_question(request.query), request.return_chart,
+        request.download_csv, request.chart_format, request.chart_dpi
+    )
 
 def generate_csv(filtered_df: pd.DataFrame, user_id: str) -> str:
     """Generate a CSV file from filtered data and return the URL"""
@@ -244,30 +253,32 @@ def generate_csv(filtered_df: pd.DataFrame, user_id: str) -> str:
         return ""
     
     try:
-        # Create CSV filename
-        csv_filename = f"filtered_properties_{user_id}_{uuid.uuid4().hex}.csv"
-        csv_path = f"data/{csv_filename}"
-        
-        # Save the filtered data to CSV
-        filtered_df.to_csv(csv_path, index=False)
+        content = filtered_df.to_csv(index=False).encode("utf-8")
+        csv_name = artifact_store.put(content, "csv", user_id)
         
-        return f"/analyze/download_csv/{csv_filename}"
+        return f"/analyze/download_csv/{csv_name}"
     except Exception as e:
         print(f"Error generating CSV: {e}")
         return ""
 
-@analyze_router.post("/analyze_portfolio", response_model=AnalyzeResponse)
-async def analyze_portfolio(request: AnalyzeRequest, db: Session = Depends(get_db)):
-    """Analyze portfolio based on natural language query"""
-    
-    if df.empty:
-        raise HTTPException(status_code=500, detail="Property data not available")
-    
+def claim_artifacts(result: Dict[str, Any], user_id: str):
+    """Give a requester ownership of the chart and CSV of a result, whoever generated them,
+    so shared results count against every requester's artifact quota"""
+    for url in (result["chart_url"], result["csv_url"]):
+        if url:
+            artifact_store.claim(url.rsplit("/", 1)[-1], user_id)
+
+async def run_analysis(request: AnalyzeRequest, dataset) -> Dict[str, Any]:
+    """Filter, summarize, chart and export for one query; the part identical requests share.
+
+    The LLM calls and CSV export run in the threadpool so other requests,
+    including ones that will share this result, are served meanwhile.
+    """
     # Step 1: Parse the natural language query
-    filters = parse_natural_language_query(request.query)
+    filters = await run_in_threadpool(parse_natural_language_query, request.query)
     
     # Step 2: Apply filters to the dataset
-    filtered_df = apply_filters(df, filters)
+    filtered_df = dataset.filter(filters)
     
     # Step 3: Prepare matches for response
     if not filtered_df.empty:
@@ -291,18 +302,64 @@ async def analyze_portfolio(request: AnalyzeRequest, db: Session = Depends(get_d
                 match['Rent/SF/Year'] = format_currency(match['Rent/SF/Year'])
             if 'GCI On 3 Years' in match and isinstance(match['GCI On 3 Years'], (int, float)):
                 match['GCI On 3 Years'] = format_currency(match['GCI On 3 Years'])
+            if 'Monthly Rent' in match and isinstance(match['Monthly Rent'], (int, float)):
+                match['Monthly Rent'] = format_currency(match['Monthly Rent'])
             
             matches.append(match)
     else:
         matches = []
     
     # Step 4: Generate summary
-    summary = generate_summary(matches, request.query)
+    usage: Dict[str, int] = {}
+    summary = await run_in_threadpool(generate_summary, matches, request.query, usage)
     
     # Step 5: Create query interpretation
     query_interpretation = f"Applied filters: {json.dumps(filters, indent=2)}" if filters else "No specific filters detected - showing general portfolio information"
     
-    # Step 6: Log the interaction
+    # Step 6: Generate chart if requested
+    chart_url = ""
+    if request.return_chart and not filtered_df.empty:
+        chart_url = await generate_chart(
+            filtered_df, filters, dataset.identity, request.user_id,
+            dpi=request.chart_dpi, fmt=request.chart_format
+        )
+    
+    # Step 7: Generate CSV if requested
+    csv_url = ""
+    if request.download_csv and not filtered_df.empty:
+        csv_url = await run_in_threadpool(generate_csv, filtered_df, request.user_id)
+    
+    return {
+        "summary": summary,
+        "matches": matches,
+        "total_matches": len(matches),
+        "query_interpretation": query_interpretation,
+        "chart_url": chart_url,
+        "csv_url": csv_url,
+        "usage": usage
+    }
+
+@analyze_router.post("/analyze_portfolio", response_model=AnalyzeResponse)
+async def analyze_portfolio(request: AnalyzeRequest, db: Session = Depends(get_db)):
+    """Analyze portfolio based on natural language query"""
+    
+    dataset = get_dataset()
+    if dataset.empty:
+        raise HTTPException(status_code=500, detail="Property data not available")
+    
+    if request.return_chart:
+        if request.chart_format not in CHART_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported chart format: {request.chart_format}")
+        if not MIN_CHART_DPI <= request.chart_dpi <= MAX_CHART_DPI:
+            raise HTTPException(status_code=400, detail=f"chart_dpi must be between {MIN_CHART_DPI} and {MAX_CHART_DPI}")
+    
+    # Steps 1-7 run once for all identical requests in flight
+    result, coalesced = await analysis_flights.run(
+        analysis_key(request, dataset.version), lambda: run_analysis(request, dataset)
+    )
+    
+    # Step 8: Record artifact ownership and log the interaction for every requester
+    await run_in_threadpool(claim_artifacts, result, request.user_id)
     try:
         db.add(Conversation(
             user_id=request.user_id, 
@@ -311,7 +368,7 @@ async def analyze_portfolio(request: AnalyzeRequest, db: Session = Depends(get_d
             tag="Portfolio Analysis"
         ))
         
-        response_message = f"Portfolio analysis complete. Found {len(matches)} matches."
+        response_message = f"Portfolio analysis complete. Found {result['total_matches']} matches."
         db.add(Conversation(
             user_id=request.user_id,
             message=response_message,
@@ -323,75 +380,150 @@ async def analyze_portfolio(request: AnalyzeRequest, db: Session = Depends(get_d
     except Exception as e:
         print(f"Error logging conversation: {e}")
     
-    # Step 7: Generate chart if requested
-    chart_url = ""
-    if request.return_chart and not filtered_df.empty:
-        chart_url = generate_chart(filtered_df, request.user_id)
-    
-    # Step 8: Generate CSV if requested
-    csv_url = ""
-    if request.download_csv and not filtered_df.empty:
-        csv_url = generate_csv(filtered_df, request.user_id)
-    
-    return AnalyzeResponse(
-        summary=summary,
-        matches=matches,
-        total_matches=len(matches),
-        query_interpretation=query_interpretation,
-        chart_url=chart_url,
-        csv_url=csv_url
-    )
+    return AnalyzeResponse(**result, coalesced=coalesced)
 
 @analyze_router.get("/portfolio_stats")
 async def get_portfolio_stats():
     """Get basic portfolio statistics"""
-    if df.empty:
+    dataset = get_dataset()
+    if dataset.empty:
         raise HTTPException(status_code=500, detail="Property data not available")
     
-    # Clean the data
-    df_clean = df.copy()
-    df_clean['Size (SF)'] = pd.to_numeric(df_clean['Size (SF)'], errors='coerce')
-    df_clean['Rent/SF/Year'] = df_clean['Rent/SF/Year'].apply(clean_currency_string)
-    df_clean['GCI On 3 Years'] = df_clean['GCI On 3 Years'].apply(clean_currency_string)
+    summary = dataset.describe(['Size (SF)', 'Rent/SF/Year', 'GCI On 3 Years'])
+    size, rent, gci = summary['Size (SF)'], summary['Rent/SF/Year'], summary['GCI On 3 Years']
     
-    # Convert numpy types to Python types for JSON serialization
+    # Missing values (e.g. an all-empty column) are reported as 0.0
     stats = {
-        "total_properties": int(len(df_clean)),
-        "avg_size_sf": float(df_clean['Size (SF)'].mean()) if not df_clean['Size (SF)'].isna().all() else 0.0,
-        "avg_rent_per_sf": float(df_clean['Rent/SF/Year'].mean()) if not df_clean['Rent/SF/Year'].isna().all() else 0.0,
-        "avg_gci_3_years": float(df_clean['GCI On 3 Years'].mean()) if not df_clean['GCI On 3 Years'].isna().all() else 0.0,
+        "total_properties": int(dataset.row_count),
+        "dataset_version": dataset.version,
+        "avg_size_sf": size["mean"] or 0.0,
+        "avg_rent_per_sf": rent["mean"] or 0.0,
+        "avg_gci_3_years": gci["mean"] or 0.0,
         "size_range": {
-            "min": float(df_clean['Size (SF)'].min()) if not df_clean['Size (SF)'].isna().all() else 0.0,
-            "max": float(df_clean['Size (SF)'].max()) if not df_clean['Size (SF)'].isna().all() else 0.0
+            "min": size["min"] or 0.0,
+            "max": size["max"] or 0.0
         },
         "rent_range": {
-            "min": float(df_clean['Rent/SF/Year'].min()) if not df_clean['Rent/SF/Year'].isna().all() else 0.0,
-            "max": float(df_clean['Rent/SF/Year'].max()) if not df_clean['Rent/SF/Year'].isna().all() else 0.0
+            "min": rent["min"] or 0.0,
+            "max": rent["max"] or 0.0
         }
     }
     
     return stats
 
+@analyze_router.post("/aggregate", response_model=AggregateResponse)
+async def aggregate_portfolio(request: AggregateRequest):
+    """Group-by aggregation (sum/mean/count/min/max/percentiles) over the cleaned dataset"""
+    dataset = get_dataset()
+    if dataset.empty:
+        raise HTTPException(status_code=500, detail="Property data not available")
+    
+    validate_aggregate_request(request, dataset.columns)
+    
+    cache_key = (dataset.version, json.dumps(request.dict(), sort_keys=True))
+    if cache_key in aggregate_cache:
+        aggregate_cache.move_to_end(cache_key)
+        return AggregateResponse(**aggregate_cache[cache_key], cached=True)
+    
+    result = dataset.aggregate(request.group_by, request.metrics, request.filters)
+    
+    if request.sort_by:
+        if request.sort_by not in result.columns:
+            raise HTTPException(status_code=400, detail=f"Unknown sort_by column: {request.sort_by}")
+        result = result.sort_values(request.sort_by, ascending=not request.descending)
+    
+    payload = {
+        "groups": dataframe_to_records(result.head(request.limit)),
+        "total_groups": int(len(result)),
+        "dataset_version": dataset.version
+    }
+    aggregate_cache[cache_key] = payload
+    if len(aggregate_cache) > AGGREGATE_CACHE_SIZE:
+        aggregate_cache.popitem(last=False)
+    
+    return AggregateResponse(**payload)
+
+@analyze_router.post("/export")
+async def export_portfolio(request: ExportRequest, db: Session = Depends(get_db)):
+    """Stream the filtered portfolio as CSV, Parquet or Arrow IPC without writing to disk"""
+    dataset = get_dataset()
+    if dataset.empty:
+        raise HTTPException(status_code=500, detail="Property data not available")
+    
+    if request.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {request.format}")
+    if request.format != "csv" and not pyarrow_available():
+        raise HTTPException(status_code=400, detail=f"{request.format} export requires the pyarrow package")
+    if request.chunk_rows < 1:
+        raise HTTPException(status_code=400, detail="chunk_rows must be positive")
+    
+    # Explicit filters win; otherwise interpret the natural language query (if any)
+    if request.filters is not None:
+        filters = request.filters
+    elif request.query:
+        filters = await run_in_threadpool(parse_natural_language_query, request.query)
+    else:
+        filters = {}
+    
+    # Log the export like other portfolio requests
+    try:
+        db.add(Conversation(
+            user_id=request.user_id,
+            message=request.query or f"Export with filters: {json.dumps(filters)}",
+            role="user",
+            tag="Portfolio Export"
+        ))
+        db.commit()
+    except Exception as e:
+        print(f"Error logging conversation: {e}")
+    
+    return StreamingResponse(
+        stream_export(dataset.iter_filtered(filters, request.chunk_rows), request.format),
+        media_type=EXPORT_FORMATS[request.format],
+        headers={"Content-Disposition": f'attachment; filename="filtered_properties.{request.format}"'}
+    )
+
+@analyze_router.post("/admin/reload_dataset")
+async def reload_portfolio_dataset(x_admin_token: Optional[str] = Header(None)):
+    """Re-read the property CSV in the background and swap it in without a restart"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not hmac.compare_digest((x_admin_token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    try:
+        # Parse off the event loop; other requests keep using the current snapshot
+        dataset = await run_in_threadpool(reload_dataset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Dataset reload failed: {str(e)}")
+    
+    return {
+        "message": "Dataset reloaded successfully",
+        "dataset_version": dataset.version,
+        "total_properties": int(dataset.row_count),
+        "loaded_at": dataset.loaded_at.isoformat()
+    }
+
 @analyze_router.get("/download_chart/{filename}")
 async def download_chart(filename: str):
     """Download a generated chart file"""
-    chart_path = f"data/{filename}"
-    if os.path.exists(chart_path):
+    chart_path = artifact_store.open_path(filename)
+    if chart_path:
         return FileResponse(
             path=chart_path,
             filename=filename,
-            media_type="image/png"
+            media_type=chart_media_type(filename)
         )
     raise HTTPException(status_code=404, detail="Chart not found")
 
 @analyze_router.get("/download_csv/{filename}")
 async def download_csv(filename: str):
     """Download a generated CSV file"""
-    csv_path = f"data/{filename}"
-    if os.path.exists(csv_path):
+    csv_path = artifact_store.open_path(filename)
+    if csv_path:
         return FileResponse(
             path=csv_path,
             filename=filename,
             media_type="text/csv"
         )
-    raise HTTPException(status_code=404, detail="CSV not found") 
\ No newline at end of file
+    raise HTTPException(status_code=404, detail="CSV not found")
\ No newline at end of file
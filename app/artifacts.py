@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import Dict, Optional, Set
+
+# Generated charts and CSVs live here, named by the SHA-256 of their content (or of a cache key)
+ARTIFACT_DIR = "data/artifacts"
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", 24 * 60 * 60))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", 500 * 1024 * 1024))
+ARTIFACT_USER_QUOTA_BYTES = int(os.getenv("ARTIFACT_USER_QUOTA_BYTES", 50 * 1024 * 1024))
+ARTIFACT_JANITOR_INTERVAL = int(os.getenv("ARTIFACT_JANITOR_INTERVAL", 300))
+
+ARTIFACT_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{1,8}$')
+
+class ArtifactRecord:
+    """Bookkeeping for one stored artifact"""
+    __slots__ = ("size", "last_access", "owners")
+
+    def __init__(self, size: int, last_access: float):
+        self.size = size
+        self.last_access = last_access
+        self.owners: Set[str] = set()
+
+class ArtifactStore:
+    """Content-addressed file store with TTL/size eviction and per-user quotas.
+
+    The directory is the source of truth (several workers may share it); the
+    in-memory index only speeds up lookups and tracks which users own what.
+    """
+
+    def __init__(self, directory: str = ARTIFACT_DIR, ttl_seconds: int = ARTIFACT_TTL_SECONDS,
+                 max_bytes: int = ARTIFACT_MAX_BYTES, user_quota_bytes: int = ARTIFACT_USER_QUOTA_BYTES):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.user_quota_bytes = user_quota_bytes
+        self.records: Dict[str, ArtifactRecord] = {}
+        self.lock = threading.Lock()
+        self.janitor_thread: Optional[threading.Thread] = None
+        self.janitor_stop = threading.Event()
+        self.scan()
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def scan(self):
+        """Rebuild the index from the files already on disk"""
+        if not os.path.isdir(self.directory):
+            return
+        with self.lock:
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and ARTIFACT_NAME_PATTERN.match(entry.name):
+                    stat = entry.stat()
+                    self.records.setdefault(entry.name, ArtifactRecord(stat.st_size, stat.st_mtime))
+
+    def put(self, content: bytes, extension: str, user_id: str, key: Optional[str] = None) -> str:
+        """Store content for a user and return its artifact name.
+
+        The name is the content hash, so identical files are stored once, or
+        key when given (a SHA-256 hex digest such as a chart cache key) so the
+        artifact can be found again with lookup() from any worker or after a restart.
+        """
+        digest = key or hashlib.sha256(content).hexdigest()
+        name = f"{digest}.{extension}"
+        path = self.path_for(name)
+
+        with self.lock:
+            record = self.records.get(name)
+        if record is None or not os.path.exists(path):
+            # Written outside the lock so a large file doesn't stall other requests;
+            # concurrent writers of the same name produce the same file, and the
+            # rename means readers never see a partial one
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            record = self.records.get(name)
+            if record is None:
+                record = ArtifactRecord(len(content), time.time())
+                self.records[name] = record
+            record.last_access = time.time()
+            record.owners.add(user_id)
+            self._enforce_user_quota(user_id, keep=name)
+
+        return name
+
+    def claim(self, name: str, user_id: str) -> bool:
+        """Add a user as an owner of a stored artifact, counting it against their quota.
+
+        For artifacts generated once and handed to several requesters; False if
+        the artifact is no longer indexed.
+        """
+        with self.lock:
+            record = self.records.get(name)
+            if record is None:
+                return False
+            record.last_access = time.time()
+            record.owners.add(user_id)
+            self._enforce_user_quota(user_id, keep=name)
+        return True
+
+    def lookup(self, key: str, extension: str) -> Optional[str]:
+        """Return the name of the artifact stored under a key, if it still exists"""
+        name = f"{key}.{extension}"
+        if not ARTIFACT_NAME_PATTERN.match(name):
+            return None
+        with self.lock:
+            if name in self.records:
+                return name
+        # Possibly written by another worker, or before a restart
+        path = self.path_for(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            self.records.setdefault(name, ArtifactRecord(stat.st_size, stat.st_mtime))
+        return name
+
+    def open_path(self, name: str) -> Optional[str]:
+        """Resolve an artifact name to a file path and mark it as recently used"""
+        if not ARTIFACT_NAME_PATTERN.match(name):
+            return None
+
+        path = self.path_for(name)
+        with self.lock:
+            record = self.records.get(name)
+            if record is None:
+                # Possibly written by another worker sharing the directory
+                if not os.path.exists(path):
+                    return None
+                record = ArtifactRecord(os.path.getsize(path), time.time())
+                self.records[name] = record
+
+            now = time.time()
+            record.last_access = now
+        try:
+            os.utime(path, (now, now))  # lets other workers' janitors see the access
+        except FileNotFoundError:
+            with self.lock:
+                self.records.pop(name, None)
+            return None
+        return path
+
+    def _remove(self, name: str):
+        """Drop an artifact from disk and the index (caller holds the lock)"""
+        self.records.pop(name, None)
+        try:
+            os.remove(self.path_for(name))
+        except FileNotFoundError:
+            pass
+
+    def _enforce_user_quota(self, user_id: str, keep: str):
+        """Release a user's least recently used artifacts until they fit the quota"""
+        owned = sorted(
+            (record.last_access, name)
+            for name, record in self.records.items()
+            if user_id in record.owners
+        )
+        used = sum(self.records[name].size for _, name in owned)
+        for _, name in owned:
+            if used <= self.user_quota_bytes:
+                break
+            if name == keep:
+                continue
+            record = self.records[name]
+            record.owners.discard(user_id)
+            used -= record.size
+            if not record.owners:
+                self._remove(name)
+
+    def evict(self) -> int:
+        """Delete expired artifacts, then the least recently used ones over the size cap"""
+        self.scan()
+        now = time.time()
+        removed = 0
+
+        with self.lock:
+            for name in list(self.records):
+                path = self.path_for(name)
+                try:
+                    # Use the newest of our view and the file mtime (touched on every download)
+                    last_access = max(self.records[name].last_access, os.path.getmtime(path))
+                except FileNotFoundError:
+                    self.records.pop(name, None)
+                    continue
+                if now - last_access > self.ttl_seconds:
+                    self._remove(name)
+                    removed += 1
+
+            total = sum(record.size for record in self.records.values())
+            if total > self.max_bytes:
+                for name, record in sorted(self.records.items(), key=lambda item: item[1].last_access):
+                    if total <= self.max_bytes:
+                        break
+                    total -= record.size
+                    self._remove(name)
+                    removed += 1
+
+        return removed
+
+    def _janitor_loop(self, interval: int):
+        while not self.janitor_stop.wait(interval):
+            try:
+                removed = self.evict()
+                if removed:
+                    print(f"Artifact janitor removed {removed} files")
+            except Exception as e:
+                print(f"Artifact janitor error: {e}")
+
+    def start_janitor(self, interval: int = ARTIFACT_JANITOR_INTERVAL):
+        """Run eviction periodically in a daemon thread"""
+        if self.janitor_thread is not None and self.janitor_thread.is_alive():
+            return
+        self.janitor_stop.clear()
+        self.janitor_thread = threading.Thread(
+            target=self._janitor_loop, args=(interval,), name="artifact-janitor", daemon=True
+        )
+        self.janitor_thread.start()
+
+    def stop_janitor(self):
+        self.janitor_stop.set()
+        if self.janitor_thread is not None:
+            self.janitor_thread.join(timeout=5)
+            self.janitor_thread = None
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "artifacts": len(self.records),
+                "total_bytes": sum(record.size for record in self.records.values())
+            }
+
+# Shared store used by chart and CSV generation
+artifact_store = ArtifactStore()
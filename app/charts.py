@@ -0,0 +1,133 @@
+import os
+import io
+import json
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from app.artifacts import artifact_store
+
+# Output formats supported by the chart renderer and their media types
+CHART_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "json": "application/json"
+}
+DEFAULT_CHART_DPI = 300
+MIN_CHART_DPI = 50
+MAX_CHART_DPI = 600
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", min(2, os.cpu_count() or 1)))
+
+# Worker pool is created lazily so importing this module stays cheap
+chart_pool: Optional[ProcessPoolExecutor] = None
+
+def get_chart_pool() -> ProcessPoolExecutor:
+    """Return the shared chart rendering pool, starting it on first use"""
+    global chart_pool
+    if chart_pool is None:
+        # spawn keeps workers independent of the server's threads and event loop
+        chart_pool = ProcessPoolExecutor(
+            max_workers=CHART_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return chart_pool
+
+def shutdown_chart_pool():
+    """Stop the chart rendering pool (called on app shutdown)"""
+    global chart_pool
+    if chart_pool is not None:
+        chart_pool.shutdown(wait=False, cancel_futures=True)
+        chart_pool = None
+
+def chart_cache_key(filters: Dict[str, Any], dataset_identity: str, dpi: int, fmt: str) -> str:
+    """Hash the filter set, dataset identity and render options into a cache key.
+
+    Chart artifacts outlive the process, so the key uses the dataset's content
+    identity rather than its in-process version counter.
+    """
+    payload = json.dumps(
+        {"filters": filters, "dataset": dataset_identity, "dpi": dpi, "format": fmt},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_chart_series(filtered_df: pd.DataFrame) -> Dict[str, Any]:
+    """Extract the top 10 properties by GCI as plain labels/values for rendering"""
+    top_properties = filtered_df.nlargest(10, 'GCI On 3 Years')
+
+    addresses = top_properties.get('Property Address', pd.Series('Unknown', index=top_properties.index))
+    suites = top_properties.get('Suite', pd.Series('', index=top_properties.index))
+
+    labels = []
+    for address, suite in zip(addresses.astype(str), suites.astype(str)):
+        address = address[:30]
+        if suite and suite != 'nan':
+            labels.append(f"{address} - {suite}")
+        else:
+            labels.append(address)
+
+    return {
+        "title": "Top 10 Properties by GCI (3 Years)",
+        "x_label": "GCI On 3 Years ($)",
+        "labels": labels,
+        "values": [float(value) for value in top_properties['GCI On 3 Years']]
+    }
+
+def render_chart(series: Dict[str, Any], dpi: int, fmt: str) -> bytes:
+    """Render a horizontal bar chart to PNG/SVG bytes (runs inside a pool worker)"""
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 8))
+    try:
+        labels = series["labels"]
+        plt.barh(range(len(labels)), series["values"])
+        plt.yticks(range(len(labels)), labels)
+        plt.xlabel(series["x_label"])
+        plt.title(series["title"])
+        plt.tight_layout()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+async def generate_chart(filtered_df: pd.DataFrame, filters: Dict[str, Any], dataset_identity: str,
+                         user_id: str, dpi: int = DEFAULT_CHART_DPI, fmt: str = "png") -> str:
+    """Render (or reuse) a chart for a filter set and return its download URL"""
+    if filtered_df.empty:
+        return ""
+
+    key = chart_cache_key(filters, dataset_identity, dpi, fmt)
+    cached_name = artifact_store.lookup(key, fmt)
+    if cached_name:
+        return f"/analyze/download_chart/{cached_name}"
+
+    try:
+        series = build_chart_series(filtered_df)
+
+        if fmt == "json":
+            # Client-side rendering: ship the series, no matplotlib needed
+            content = json.dumps(series).encode("utf-8")
+        else:
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(get_chart_pool(), render_chart, series, dpi, fmt)
+
+        # The chart is named by its cache key, so every worker finds it
+        chart_name = await run_in_threadpool(artifact_store.put, content, fmt, user_id, key)
+        return f"/analyze/download_chart/{chart_name}"
+    except Exception as e:
+        print(f"Error generating chart: {e}")
+        return ""
+
+def chart_media_type(filename: str) -> str:
+    """Media type for a chart file based on its extension"""
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    return CHART_FORMATS.get(ext, "application/octet-stream")
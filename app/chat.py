@@ -1,21 +1,20 @@
-from fastapi import APIRouter, Request, Depends
-from pydantic import BaseModel
-from openai import OpenAI
-import os
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict
 from app.crm import SessionLocal, User, Conversation, ChatSession
-from app.rag import query_knowledge_base
+from app.rag import query_knowledge_base_with_ids, resolve_namespace, NAMESPACE_PATTERN
+from app.context_budget import pack_chat_messages
+from app.session_memory import recent_history, maybe_update_summary
+from app.response_cache import chat_response_cache, cache_key, is_follow_up
+from app.llm_gateway import LLMOverloaded
+from app.llm import complete
 
 load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
-
 chat_endpoint = APIRouter()
 
 # Dependency to get DB session
@@ -30,10 +29,16 @@ class ChatRequest(BaseModel):
     user_id: str
     message: str
     session_id: Optional[str] = None
+    # Knowledge base to search (a user or team id); the shared one if omitted
+    namespace: Optional[str] = Field(None, pattern=NAMESPACE_PATTERN.pattern)
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
+    # Prompt token accounting from the context budget (plus the LLM's own counts when reported)
+    usage: Dict[str, int] = {}
+    # True when the answer came from the response cache instead of the LLM
+    cached: bool = False
 
 def auto_tag_response(text: str) -> str:
     keywords = ["the rent is", "you can find it at", "is available at", "it is located", "yes", "no", "sure", "certainly"]
@@ -85,41 +90,51 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
             session.updated_at = datetime.utcnow()
             db.commit()
 
-        # Step 3: Retrieve past conversation from this session (last 10 messages)
-        previous_messages = (
-            db.query(Conversation)
-            .filter(Conversation.session_id == session.id)
-            .order_by(Conversation.timestamp.desc())
-            .limit(10)
-            .all()
-        )
-        history = [
-            {"role": msg.role, "content": msg.message}
-            for msg in reversed(previous_messages)
-        ]
+        # Step 3: Retrieve the latest turns of this session; older ones are covered by session.summary
+        history = recent_history(db, session)
 
         # Step 4: Add current user message
         history.append({"role": "user", "content": request.message})
 
         # Step 5: Add relevant context from RAG (with error handling)
+        context_docs = []
+        generation, chunk_ids = None, []
         try:
-            context_docs = query_knowledge_base(request.message)
-            context = "\n".join(context_docs)
-            if context:
-                history.insert(0, {"role": "system", "content": "Use the following context if helpful:\n" + context})
+            generation, chunk_ids, context_docs = query_knowledge_base_with_ids(request.message, namespace=request.namespace)
         except Exception as e:
             print(f"RAG query error: {e}")
             # Continue without context if RAG fails
 
-        # Step 6: Get LLM response
-        try:
-            completion = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=history
-            )
-            response = completion.choices[0].message.content.strip()
-        except Exception as e:
-            response = f"Error: {str(e)}"
+        # Fit context and history into the prompt token budget
+        messages, usage = pack_chat_messages(history, context_docs, summary=session.summary)
+
+        # Step 6: Answer from the cache when the same question was asked against the same
+        # context, in any session; otherwise get the LLM response. No key (and no caching)
+        # if retrieval failed, the knowledge base changed while it ran, or the question
+        # refers back to earlier turns, whose answer depends on this conversation
+        key = None
+        follow_up = (len(history) > 1 or bool(session.summary)) and is_follow_up(request.message)
+        if generation is not None and not follow_up:
+            key = cache_key(resolve_namespace(request.namespace), generation, request.message, chunk_ids)
+        response = chat_response_cache.get(key) if key else None
+        cached = response is not None
+        if not cached:
+            # End the read transaction so the pooled connection isn't held while waiting on the LLM
+            db.commit()
+            try:
+                # Queue for the shared LLM limits off the event loop
+                completion = await run_in_threadpool(complete, messages, "chat", request.message)
+                response = completion.text.strip()
+                if completion.prompt_tokens is not None:
+                    usage["llm_prompt_tokens"] = completion.prompt_tokens
+                    usage["llm_completion_tokens"] = completion.completion_tokens
+                if key:
+                    chat_response_cache.put(key, response)
+            except LLMOverloaded:
+                # Answered with a 503 so the client retries instead of logging an error reply
+                raise
+            except Exception as e:
+                response = f"Error: {str(e)}"
 
         # Step 7: Log user message and assistant response with session_id
         db.add(Conversation(
@@ -139,8 +154,13 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
         ))
         db.commit()
 
-        return {"response": response, "session_id": session.id}
+        # Step 8: Refresh the session summary in the background every few turns
+        maybe_update_summary(db, session)
+
+        return {"response": response, "session_id": session.id, "usage": usage, "cached": cached}
     
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Chat endpoint error: {e}")
         import traceback
@@ -0,0 +1,116 @@
+import os
+import zlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List
+
+# Chunks are packed into blocks of this many, each compressed as a unit
+CHUNK_STORE_BLOCK_CHUNKS = int(os.getenv("CHUNK_STORE_BLOCK_CHUNKS", 64))
+# "zlib" compresses sealed blocks; "none" keeps them as raw UTF-8
+CHUNK_STORE_COMPRESSION = os.getenv("CHUNK_STORE_COMPRESSION", "zlib").lower()
+# Decompressed blocks kept for repeated reads (query results cluster in few blocks)
+CHUNK_BLOCK_CACHE = int(os.getenv("CHUNK_BLOCK_CACHE", 64))
+ZLIB_LEVEL = 6
+
+class ChunkStore:
+    """Append-only sequence of text chunks held as UTF-8 bytes instead of str objects.
+
+    Chunk i spans offsets[i]:offsets[i + 1] of the concatenated UTF-8 text.
+    Every CHUNK_STORE_BLOCK_CHUNKS chunks form a block that is compressed once
+    full; the newest block stays an uncompressed bytearray until it fills up.
+    Reads decompress a whole block and keep it in a small LRU cache.
+    """
+
+    def __init__(self, texts: Iterable[str] = (), block_chunks: int = CHUNK_STORE_BLOCK_CHUNKS,
+                 compression: str = CHUNK_STORE_COMPRESSION):
+        self.block_chunks = block_chunks
+        self.compression = compression
+        self.offsets = array("Q", [0])
+        self.blocks: List[bytes] = []  # sealed blocks
+        self.tail = bytearray()  # the block being filled
+        self._init_cache()
+        for text in texts:
+            self.append(text)
+
+    def _init_cache(self):
+        self.cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def append(self, text: str):
+        data = text.encode("utf-8")
+        self.tail.extend(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        if len(self) % self.block_chunks == 0:
+            self._seal()
+
+    def _seal(self):
+        block = bytes(self.tail)
+        self.blocks.append(zlib.compress(block, ZLIB_LEVEL) if self.compression == "zlib" else block)
+        # Rebind rather than clear so a concurrent reader of the old tail still sees its bytes
+        self.tail = bytearray()
+
+    def _decompress(self, number: int) -> bytes:
+        block = self.blocks[number]
+        return zlib.decompress(block) if self.compression == "zlib" else block
+
+    def _block(self, number: int) -> bytes:
+        if number >= len(self.blocks):
+            return self.tail
+        if self.compression != "zlib":
+            return self.blocks[number]
+        with self.cache_lock:
+            data = self.cache.get(number)
+            if data is not None:
+                self.cache.move_to_end(number)
+                return data
+        data = self._decompress(number)
+        with self.cache_lock:
+            self.cache[number] = data
+            while len(self.cache) > CHUNK_BLOCK_CACHE:
+                self.cache.popitem(last=False)
+        return data
+
+    def __getitem__(self, index: int) -> str:
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        number = index // self.block_chunks
+        data = self._block(number)
+        base = self.offsets[number * self.block_chunks]
+        return data[self.offsets[index] - base:self.offsets[index + 1] - base].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield every chunk in order, decompressing each block once without touching the cache"""
+        count = len(self)
+        for number in range(len(self.blocks) + 1):
+            first = number * self.block_chunks
+            last = min(first + self.block_chunks, count)
+            if first >= last:
+                break
+            data = self._decompress(number) if number < len(self.blocks) else self.tail
+            base = self.offsets[first]
+            for i in range(first, last):
+                yield data[self.offsets[i] - base:self.offsets[i + 1] - base].decode("utf-8")
+
+    def select(self, indices: Iterable[int]) -> "ChunkStore":
+        """A new store holding the chunks at the given positions, in that order"""
+        return ChunkStore((self[i] for i in indices), self.block_chunks, self.compression)
+
+    def nbytes(self) -> int:
+        """Approximate resident size of the stored text and offsets"""
+        return sum(len(block) for block in self.blocks) + len(self.tail) + self.offsets.itemsize * len(self.offsets)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["cache"], state["cache_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._init_cache()
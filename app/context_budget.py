@@ -0,0 +1,164 @@
+import os
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+from app.document_processor import TOKEN_PATTERN, CHARS_PER_TOKEN, count_tokens as count_words
+
+# Total tokens of a chat prompt: retrieved context, history and the new message
+CHAT_PROMPT_TOKENS = int(os.getenv("CHAT_PROMPT_TOKENS", 3000))
+# Share of the budget left after the user's message that retrieved context may take;
+# whatever it doesn't use goes to history
+CHAT_CONTEXT_SHARE = float(os.getenv("CHAT_CONTEXT_SHARE", 0.5))
+# Sample property rows sent with the portfolio summary prompt
+SUMMARY_SAMPLE_TOKENS = int(os.getenv("SUMMARY_SAMPLE_TOKENS", 600))
+# Role and separator tokens the chat format adds to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+# A context chunk trimmed below this many tokens is dropped instead
+MIN_CONTEXT_TOKENS = 32
+
+CONTEXT_PREFIX = "Use the following context if helpful:\n"
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_encoding = None
+_encoding_loaded = False
+
+def get_encoding():
+    """The tiktoken encoding for exact counts, if tiktoken is installed"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Tokens in text: exact with tiktoken, otherwise a conservative estimate"""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Word counts miss sub-word tokens in long words and numbers; character length catches those
+    return max(count_words(text), math.ceil(len(text) / CHARS_PER_TOKEN))
+
+def count_message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text that fits in max_tokens, cut at a token boundary"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+
+    # Binary search over word/punctuation boundaries
+    ends = [match.end() for match in TOKEN_PATTERN.finditer(text)]
+    low, high = 0, len(ends)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:ends[middle - 1]]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:ends[low - 1]] if low else ""
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation or spaces after separators"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def fit_json_records(records: List[Any], max_tokens: int) -> Tuple[str, int]:
+    """Compact JSON array of as many leading records as fit in max_tokens.
+
+    Returns the JSON and the number of records it holds.
+    """
+    parts = []
+    used = 2  # the brackets
+    for record in records:
+        text = compact_json(record)
+        tokens = count_tokens(text) + 1
+        if used + tokens > max_tokens:
+            break
+        parts.append(text)
+        used += tokens
+    return "[" + ",".join(parts) + "]", len(parts)
+
+def pack_chat_messages(history: List[Dict[str, str]], context_docs: List[str],
+                       max_tokens: int = CHAT_PROMPT_TOKENS,
+                       context_share: float = CHAT_CONTEXT_SHARE,
+                       summary: Optional[str] = None) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+    """Fit retrieved context and chat history into a prompt of at most max_tokens.
+
+    history ends with the new user message, which is always sent (trimmed if
+    it alone exceeds the budget), followed by the session summary if it fits.
+    Context chunks are added in rank order up to context_share of the remaining
+    budget, the last one trimmed to fit; earlier messages then fill what is
+    left, newest first. Returns the messages and a token usage report.
+    """
+    user_message = dict(history[-1])
+    user_tokens = count_message_tokens(user_message)
+    if user_tokens > max_tokens:
+        user_message["content"] = truncate_to_tokens(user_message["content"], max_tokens - MESSAGE_OVERHEAD_TOKENS)
+        user_tokens = count_message_tokens(user_message)
+    remaining = max(0, max_tokens - user_tokens)
+
+    # Compact memory of the turns that no longer fit in history
+    summary_message: Optional[Dict[str, str]] = None
+    summary_tokens = 0
+    if summary:
+        summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+        summary_tokens = count_message_tokens(summary_message)
+        if summary_tokens > remaining:
+            summary_message, summary_tokens = None, 0
+        remaining -= summary_tokens
+
+    # Retrieved context, best match first
+    context_allowance = int(remaining * context_share)
+    context_tokens = count_tokens(CONTEXT_PREFIX) + MESSAGE_OVERHEAD_TOKENS
+    packed_docs = []
+    for doc in context_docs:
+        doc_tokens = count_tokens(doc) + 1  # joining newline
+        if context_tokens + doc_tokens > context_allowance:
+            trimmed = truncate_to_tokens(doc, context_allowance - context_tokens - 1)
+            if trimmed and count_tokens(trimmed) >= MIN_CONTEXT_TOKENS:
+                packed_docs.append(trimmed)
+                context_tokens += count_tokens(trimmed) + 1
+            break
+        packed_docs.append(doc)
+        context_tokens += doc_tokens
+    context_message: Optional[Dict[str, str]] = None
+    if packed_docs:
+        context_message = {"role": "system", "content": CONTEXT_PREFIX + "\n".join(packed_docs)}
+        # Per-part counts bound the whole from above; report the exact figure
+        context_tokens = count_message_tokens(context_message)
+        remaining -= context_tokens
+    else:
+        context_tokens = 0
+
+    # Most recent history that fits; stop at the first message that doesn't so turns stay contiguous
+    packed_history = []
+    history_tokens = 0
+    for message in reversed(history[:-1]):
+        tokens = count_message_tokens(message)
+        if history_tokens + tokens > remaining:
+            break
+        packed_history.append(message)
+        history_tokens += tokens
+    packed_history.reverse()
+
+    system_messages = [message for message in (context_message, summary_message) if message]
+    messages = system_messages + packed_history + [user_message]
+    usage = {
+        "budget_tokens": max_tokens,
+        "prompt_tokens": context_tokens + summary_tokens + history_tokens + user_tokens,
+        "summary_tokens": summary_tokens,
+        "context_tokens": context_tokens,
+        "context_chunks": len(packed_docs),
+        "history_tokens": history_tokens,
+        "history_messages": len(packed_history),
+        "dropped_history_messages": len(history) - 1 - len(packed_history)
+    }
+    return messages, usage
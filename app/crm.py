@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import create_engine, Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import create_engine, inspect, text, Column, String, Text, DateTime, Integer, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
@@ -33,6 +33,9 @@ class ChatSession(Base):
     title = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+    # Rolling summary of the oldest summarized_messages messages, kept by app.session_memory
+    summary = Column(Text, nullable=True)
+    summarized_messages = Column(Integer, default=0)
 
     user = relationship("User", back_populates="chat_sessions")
     conversations = relationship("Conversation", back_populates="session")
@@ -51,5 +54,19 @@ class Conversation(Base):
     user = relationship("User", back_populates="conversations")
     session = relationship("ChatSession", back_populates="conversations")
 
+def add_missing_columns():
+    """Add columns introduced after a table was created (create_all only creates missing tables)"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
 # Create tables (only creates new ones or adds missing)
-Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+add_missing_columns() 
\ No newline at end of file
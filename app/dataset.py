@@ -0,0 +1,237 @@
+import os
+import re
+import hashlib
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterator
+import pandas as pd
+
+CSV_PATH = "data/HackathonInternalKnowledgeBase.csv"
+# Seconds between checks of the CSV's modification time; 0 disables the watcher
+DATASET_WATCH_INTERVAL = int(os.getenv("DATASET_WATCH_INTERVAL", 30))
+# "pandas" keeps the cleaned frame in memory per worker; "sqlite" queries a shared on-disk table
+PROPERTY_STORE_BACKEND = os.getenv("PROPERTY_STORE_BACKEND", "pandas").lower()
+
+# Columns stored as currency strings ("$1,622,550") in the source CSV
+CURRENCY_COLUMNS = ['Rent/SF/Year', 'GCI On 3 Years', 'Annual Rent', 'Monthly Rent']
+NUMERIC_COLUMNS = ['Size (SF)'] + CURRENCY_COLUMNS
+
+# Aggregations supported by /analyze/aggregate; percentiles are written as p50, p90, p99.5, ...
+SIMPLE_AGGREGATIONS = {'sum', 'mean', 'count', 'min', 'max'}
+PERCENTILE_PATTERN = re.compile(r'^p(\d{1,2}(?:\.\d+)?|100)$')
+HASH_READ_BYTES = 1024 * 1024
+
+def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the dataset with numeric and currency columns converted to floats"""
+    cleaned = df.copy()
+    if 'Size (SF)' in cleaned.columns:
+        cleaned['Size (SF)'] = pd.to_numeric(cleaned['Size (SF)'], errors='coerce')
+    for column in CURRENCY_COLUMNS:
+        if column not in cleaned.columns:
+            continue
+        # Same rules as analyze.clean_currency_string, applied column-wise
+        stripped = cleaned[column].astype(str).str.replace(r'[$,"]', '', regex=True).str.strip()
+        cleaned[column] = pd.to_numeric(stripped, errors='coerce').fillna(0.0)
+    return cleaned
+
+def filter_dataframe(df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
+    """Apply filters to an already cleaned dataframe"""
+    if df.empty:
+        return df
+
+    # Build a single boolean mask instead of copying the frame per condition
+    mask = pd.Series(True, index=df.index)
+    for column, conditions in filters.items():
+        if column not in df.columns:
+            continue
+
+        for operator, value in conditions.items():
+            if operator == 'gt':
+                mask &= df[column] > value
+            elif operator == 'lt':
+                mask &= df[column] < value
+            elif operator == 'eq':
+                mask &= df[column] == value
+            elif operator == 'gte':
+                mask &= df[column] >= value
+            elif operator == 'lte':
+                mask &= df[column] <= value
+
+    return df[mask]
+
+def parse_percentile(operation: str) -> Optional[float]:
+    """Return the quantile for a percentile operation like 'p90', or None"""
+    match = PERCENTILE_PATTERN.match(operation)
+    if not match:
+        return None
+    return float(match.group(1)) / 100
+
+def aggregate_dataframe(frame: pd.DataFrame, group_by: List[str], metrics: Dict[str, List[str]]) -> pd.DataFrame:
+    """Group the frame and compute the requested metrics, one column per (metric, operation)"""
+    if group_by:
+        grouped = frame.groupby(group_by, dropna=False, sort=False)
+    else:
+        # No grouping columns: aggregate the whole (filtered) frame as a single group
+        grouped = frame.groupby(pd.Series(0, index=frame.index), sort=False)
+
+    result = grouped.size().to_frame('row_count')
+    for column, operations in metrics.items():
+        simple = [op for op in dict.fromkeys(operations) if op in SIMPLE_AGGREGATIONS]
+        if simple:
+            part = grouped[column].agg(simple)
+            part.columns = [f"{column}_{op}" for op in simple]
+            result = result.join(part)
+        for operation in dict.fromkeys(operations):
+            quantile = parse_percentile(operation)
+            if quantile is not None:
+                result[f"{column}_{operation}"] = grouped[column].quantile(quantile)
+
+    return result.reset_index(drop=not group_by)
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def optional_float(value) -> Optional[float]:
+    return None if pd.isna(value) else float(value)
+
+class DatasetSnapshot:
+    """One immutable, in-memory version of the property dataset.
+
+    Requests grab the current snapshot once and use it throughout, so a reload
+    swapping in a new snapshot never changes data under a running request.
+    The SQLite backend (app.property_store.SQLiteDataset) exposes the same
+    query methods.
+
+    version counts reloads in this process only; identity (the SHA-256 of the
+    CSV) names the data itself and is what persistent caches are keyed on.
+    """
+    __slots__ = ("raw", "clean", "version", "identity", "path", "mtime", "loaded_at")
+
+    def __init__(self, raw: pd.DataFrame, version: int, path: str, mtime: float, identity: str = ""):
+        self.raw = raw
+        self.clean = clean_dataframe(raw)
+        self.version = version
+        self.identity = identity
+        self.path = path
+        self.mtime = mtime
+        self.loaded_at = datetime.utcnow()
+
+    @property
+    def empty(self) -> bool:
+        return self.clean.empty
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.clean.columns)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.clean)
+
+    def filter(self, filters: Dict[str, Any], columns: Optional[List[str]] = None) -> pd.DataFrame:
+        filtered = filter_dataframe(self.clean, filters)
+        return filtered[columns] if columns else filtered
+
+    def iter_filtered(self, filters: Dict[str, Any], chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Yield the filtered rows in slices of at most chunk_rows (at least one, possibly empty)"""
+        filtered = filter_dataframe(self.clean, filters)
+        if filtered.empty:
+            yield filtered
+            return
+        for start in range(0, len(filtered), chunk_rows):
+            yield filtered.iloc[start:start + chunk_rows]
+
+    def aggregate(self, group_by: List[str], metrics: Dict[str, List[str]], filters: Dict[str, Any]) -> pd.DataFrame:
+        return aggregate_dataframe(filter_dataframe(self.clean, filters), group_by, metrics)
+
+    def describe(self, columns: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+        """Mean/min/max per column (None when the column has no values)"""
+        return {
+            column: {
+                "mean": optional_float(self.clean[column].mean()),
+                "min": optional_float(self.clean[column].min()),
+                "max": optional_float(self.clean[column].max())
+            }
+            for column in columns
+        }
+
+    def is_stale(self) -> bool:
+        """Whether the source CSV changed since this snapshot was read"""
+        return os.path.getmtime(self.path) != self.mtime
+
+def read_snapshot(path: str, version: int, force: bool = False):
+    """Load the dataset at path with the configured backend"""
+    if PROPERTY_STORE_BACKEND == "sqlite":
+        # Versions come from the shared database so all workers agree on them
+        from app.property_store import open_sqlite_dataset
+        return open_sqlite_dataset(path, force=force)
+    mtime = os.path.getmtime(path)
+    identity = file_sha256(path)
+    raw = pd.read_csv(path)
+    return DatasetSnapshot(raw, version, path, mtime, identity)
+
+def load_initial_snapshot():
+    try:
+        snapshot = read_snapshot(CSV_PATH, 1)
+        print(f"Loaded {snapshot.row_count} properties from {CSV_PATH} ({PROPERTY_STORE_BACKEND} backend)")
+        return snapshot
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        return DatasetSnapshot(pd.DataFrame(), 1, CSV_PATH, 0.0)
+
+# The live snapshot; replaced wholesale (a single reference swap) on reload
+current_snapshot = load_initial_snapshot()
+reload_lock = threading.Lock()
+watcher_thread: Optional[threading.Thread] = None
+watcher_stop = threading.Event()
+
+def get_dataset():
+    """Return the dataset snapshot requests should use"""
+    return current_snapshot
+
+def reload_dataset(path: Optional[str] = None, force: bool = True):
+    """Parse the CSV into a new snapshot and atomically make it current.
+
+    The old snapshot keeps serving requests while the file is parsed. If
+    parsing fails the old snapshot stays in place and the error propagates.
+    With the SQLite backend, force=False adopts a table another worker has
+    already rebuilt from the same file instead of rebuilding it again.
+    """
+    global current_snapshot
+    path = path or current_snapshot.path
+    with reload_lock:
+        snapshot = read_snapshot(path, current_snapshot.version + 1, force=force)
+        if snapshot.empty:
+            raise ValueError(f"Dataset at {path} has no rows")
+        current_snapshot = snapshot
+    print(f"Reloaded {snapshot.row_count} properties from {path} (dataset version {snapshot.version})")
+    return snapshot
+
+def _watch_loop(interval: int):
+    while not watcher_stop.wait(interval):
+        snapshot = current_snapshot
+        try:
+            if snapshot.is_stale():
+                reload_dataset(snapshot.path, force=False)
+        except Exception as e:
+            print(f"Dataset watcher error: {e}")
+
+def start_dataset_watcher(interval: int = DATASET_WATCH_INTERVAL):
+    """Reload the dataset whenever the CSV's modification time changes"""
+    global watcher_thread
+    if interval <= 0 or (watcher_thread is not None and watcher_thread.is_alive()):
+        return
+    watcher_stop.clear()
+    watcher_thread = threading.Thread(target=_watch_loop, args=(interval,), name="dataset-watcher", daemon=True)
+    watcher_thread.start()
+
+def stop_dataset_watcher():
+    global watcher_thread
+    watcher_stop.set()
+    if watcher_thread is not None:
+        watcher_thread.join(timeout=5)
+        watcher_thread = None
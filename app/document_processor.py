@@ -1,10 +1,21 @@
 import io
 import os
-from typing import List, Tuple
+import re
+from typing import List, Tuple, Iterable, Iterator
 from PyPDF2 import PdfReader
 from docx import Document
 import chardet
 
+# Chunk sizes for uploaded documents, in approximate tokens (words and punctuation marks)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 200))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+# Used to size character-based chunk_text splits of a single over-long sentence
+CHARS_PER_TOKEN = 4
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*$")
+
 def detect_encoding(file_content: bytes) -> str:
     """Detect file encoding"""
     result = chardet.detect(file_content)
@@ -32,15 +43,88 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
     
     return chunks
 
+def count_tokens(text: str) -> int:
+    """Approximate token count: words and punctuation marks"""
+    return len(TOKEN_PATTERN.findall(text))
+
+def split_sentences(text: str) -> List[str]:
+    """Split text on sentence-ending punctuation followed by whitespace"""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def iter_sentences(pieces: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """Yield sentences from a stream of lines/paragraphs, joining sentences broken across lines"""
+    carry = ""
+    for piece in pieces:
+        if carry and count_tokens(carry) + count_tokens(piece) > max_tokens:
+            # Unpunctuated text (lists, tables): fall back to line boundaries
+            yield carry
+            carry = ""
+        sentences = split_sentences(f"{carry} {piece}" if carry else piece)
+        carry = ""
+        if sentences and not SENTENCE_END.search(sentences[-1]):
+            # Unfinished sentence: continue it with the next line
+            carry = sentences.pop()
+        yield from sentences
+    if carry:
+        yield carry
+
+def chunk_stream(pieces: Iterable[str], max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[str]:
+    """Pack a stream of text into sentence-aligned chunks of at most max_tokens.
+
+    Consecutive chunks share up to overlap_tokens worth of trailing sentences.
+    A single sentence longer than max_tokens is split with chunk_text. Only the
+    current chunk is held in memory, so arbitrarily long inputs can be streamed.
+    """
+    window: List[Tuple[str, int]] = []
+    window_tokens = 0
+    fresh = False  # whether the window holds sentences not yet emitted
+
+    for sentence in iter_sentences(pieces, max_tokens):
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            if fresh:
+                yield " ".join(text for text, _ in window)
+            yield from chunk_text(sentence, chunk_size=max_tokens * CHARS_PER_TOKEN,
+                                  overlap=overlap_tokens * CHARS_PER_TOKEN)
+            window, window_tokens, fresh = [], 0, False
+            continue
+
+        if window_tokens + tokens > max_tokens and window:
+            if fresh:
+                yield " ".join(text for text, _ in window)
+            # Start the next chunk with the trailing sentences that fit in the overlap
+            overlap, overlap_size = [], 0
+            for text, size in reversed(window):
+                if overlap_size + size > overlap_tokens or overlap_size + size + tokens > max_tokens:
+                    break
+                overlap.insert(0, (text, size))
+                overlap_size += size
+            window, window_tokens = overlap, overlap_size
+
+        window.append((sentence, tokens))
+        window_tokens += tokens
+        fresh = True
+
+    if fresh:
+        yield " ".join(text for text, _ in window)
+
+def chunk_records(records: Iterable[str], max_tokens: int = CHUNK_MAX_TOKENS) -> Iterator[str]:
+    """Keep structured records (CSV rows, JSON objects) whole, splitting only oversized ones"""
+    for record in records:
+        if count_tokens(record) > max_tokens:
+            yield from chunk_text(record, chunk_size=max_tokens * CHARS_PER_TOKEN,
+                                  overlap=CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN)
+        else:
+            yield record
+
 def extract_text_from_pdf(file_content: bytes) -> str:
     """Extract text from PDF"""
     try:
         pdf_file = io.BytesIO(file_content)
         reader = PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        # Join once instead of growing a string with += per page
+        return "\n".join(page.extract_text() or "" for page in reader.pages).strip()
     except Exception as e:
         raise ValueError(f"Error processing PDF: {str(e)}")
 
@@ -49,10 +133,7 @@ def extract_text_from_docx(file_content: bytes) -> str:
     try:
         doc_file = io.BytesIO(file_content)
         doc = Document(doc_file)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text.strip()
+        return "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
     except Exception as e:
         raise ValueError(f"Error processing DOCX: {str(e)}")
 
@@ -80,7 +161,7 @@ def process_document(filename: str, file_content: bytes) -> Tuple[str, List[str]
     if not text.strip():
         raise ValueError("No text content found in document")
     
-    # Create chunks for large documents
-    chunks = chunk_text(text, chunk_size=1000, overlap=200)
+    # Create sentence-aligned chunks for large documents
+    chunks = list(chunk_stream(text.split("\n")))
     
     return text, chunks 
\ No newline at end of file
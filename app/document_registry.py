@@ -0,0 +1,155 @@
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+class DocumentRecord:
+    """Metadata of one uploaded file, as a __slots__ record instead of a per-document dict"""
+    __slots__ = (
+        "id", "filename", "upload_date", "chunk_count", "chunk_start_index", "chunk_end_index",
+        "file_size", "total_text_length", "content_hash", "duplicate_chunks", "referenced_chunks"
+    )
+
+    def __init__(self, id: int, filename: str, upload_date: str, chunk_count: int, chunk_start_index: int,
+                 chunk_end_index: int, file_size: int = 0, total_text_length: int = 0,
+                 content_hash: Optional[str] = None, duplicate_chunks: int = 0, referenced_chunks: Iterable[str] = ()):
+        self.id = id
+        # Re-uploaded reports often share a filename; keep one copy of each
+        self.filename = sys.intern(filename)
+        self.upload_date = upload_date
+        self.chunk_count = chunk_count
+        self.chunk_start_index = chunk_start_index
+        self.chunk_end_index = chunk_end_index
+        self.file_size = file_size
+        self.total_text_length = total_text_length
+        self.content_hash = content_hash
+        self.duplicate_chunks = duplicate_chunks
+        self.referenced_chunks = tuple(referenced_chunks)
+
+    @classmethod
+    def from_dict(cls, fields: Dict[str, Any]) -> "DocumentRecord":
+        """Build a record from a metadata dict (the format knowledge bases were saved in before)"""
+        return cls(**{name: fields[name] for name in cls.__slots__ if name in fields})
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {name: getattr(self, name) for name in self.__slots__}
+        record["referenced_chunks"] = list(self.referenced_chunks)
+        return record
+
+    @property
+    def uploaded_at(self) -> datetime:
+        return datetime.fromisoformat(self.upload_date)
+
+def as_naive_utc(moment: datetime) -> datetime:
+    """Upload dates are stored as naive UTC; convert aware datetimes so they compare"""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+class DocumentRegistry:
+    """A knowledge base's documents indexed by id and content hash, plus a chunk -> document map.
+
+    Ids come from a counter that only moves forward, so a deleted document's id
+    is never handed out again. Records iterate in id (upload) order.
+    """
+
+    def __init__(self, records: Iterable[DocumentRecord] = (), next_id: int = 1):
+        self.records: Dict[int, DocumentRecord] = {}
+        self.by_hash: Dict[str, int] = {}
+        self.chunk_owners = array("i")  # document id of each chunk position; 0 if none
+        self.next_id = next_id
+        for record in records:
+            self._index(record)
+
+    @classmethod
+    def from_list(cls, documents: Iterable[Any]) -> "DocumentRegistry":
+        """Build a registry from the metadata list knowledge bases used to be saved as.
+
+        That format numbered documents len + 1, so ids could repeat after a
+        delete; a repeated id is given a fresh one.
+        """
+        registry = cls()
+        for document in documents:
+            record = document if isinstance(document, DocumentRecord) else DocumentRecord.from_dict(document)
+            if record.id in registry.records:
+                record.id = registry.next_id
+            registry._index(record)
+        return registry
+
+    def _index(self, record: DocumentRecord):
+        self.records[record.id] = record
+        if record.content_hash:
+            self.by_hash.setdefault(record.content_hash, record.id)
+        self.next_id = max(self.next_id, record.id + 1)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[DocumentRecord]:
+        return iter(self.records.values())
+
+    def get(self, document_id: int) -> Optional[DocumentRecord]:
+        return self.records.get(document_id)
+
+    def find_by_hash(self, content_hash: str) -> Optional[DocumentRecord]:
+        document_id = self.by_hash.get(content_hash)
+        return self.records.get(document_id) if document_id is not None else None
+
+    def create(self, **fields) -> DocumentRecord:
+        """Register a new document under the next unused id"""
+        record = DocumentRecord(id=self.next_id, **fields)
+        self._index(record)
+        return record
+
+    def remove(self, document_id: int) -> DocumentRecord:
+        record = self.records.pop(document_id)
+        if record.content_hash and self.by_hash.get(record.content_hash) == document_id:
+            del self.by_hash[record.content_hash]
+        return record
+
+    def assign_chunks(self, document_id: int, count: int):
+        """Record the owner of count chunks just appended to the chunk store"""
+        self.chunk_owners.extend(array("i", [document_id]) * count)
+
+    def rebuild_chunk_owners(self, n_chunks: int):
+        """Recompute the chunk -> document map from the records' chunk ranges"""
+        owners = array("i", [0]) * n_chunks
+        for record in self.records.values():
+            for i in range(record.chunk_start_index, record.chunk_end_index + 1):
+                owners[i] = record.id
+        self.chunk_owners = owners
+
+    def document_for_chunk(self, chunk_index: int) -> Optional[DocumentRecord]:
+        """The document that stored a chunk (shared duplicates belong to the first uploader)"""
+        if not 0 <= chunk_index < len(self.chunk_owners):
+            return None
+        return self.records.get(self.chunk_owners[chunk_index])
+
+    def search(self, filename: Optional[str] = None, uploaded_after: Optional[datetime] = None,
+               uploaded_before: Optional[datetime] = None, offset: int = 0,
+               limit: Optional[int] = None) -> Tuple[int, List[DocumentRecord]]:
+        """Filter by filename substring (case-insensitive) and upload date range, then page.
+
+        Returns the number of matching documents and the requested page of them.
+        """
+        needle = filename.casefold() if filename else None
+        after = as_naive_utc(uploaded_after) if uploaded_after else None
+        before = as_naive_utc(uploaded_before) if uploaded_before else None
+        matches = []
+        for record in self.records.values():
+            if needle and needle not in record.filename.casefold():
+                continue
+            if after or before:
+                uploaded = record.uploaded_at
+                if (after and uploaded < after) or (before and uploaded > before):
+                    continue
+            matches.append(record)
+        stop = None if limit is None else offset + limit
+        return len(matches), matches[offset:stop]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The lookup maps are derived from the records and rebuilt on load
+        return {"next_id": self.next_id, "documents": list(self.records.values())}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(state["documents"], state["next_id"])
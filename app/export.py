@@ -0,0 +1,94 @@
+from typing import Iterator, List
+import pandas as pd
+
+# Export formats and their media types; parquet/arrow need the optional pyarrow package
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+DEFAULT_EXPORT_CHUNK_ROWS = 5000
+
+class ChunkSink:
+    """Minimal writable file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+def stream_csv(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    """Yield CSV bytes, header first, one encoded block per row chunk"""
+    header_written = False
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=not header_written).encode("utf-8")
+        header_written = True
+
+def stream_parquet(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    """Yield a Parquet file, one row group per row chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = ChunkSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                # The first chunk fixes the schema for the whole file
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        # Closing writes the footer, which must be the last bytes of the file
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+def stream_arrow(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream, one record batch per row chunk"""
+    import pyarrow as pa
+
+    sink = ChunkSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+def pyarrow_available() -> bool:
+    """Whether the optional pyarrow dependency is installed"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def stream_export(chunks: Iterator[pd.DataFrame], fmt: str) -> Iterator[bytes]:
+    """Dispatch row chunks to the streaming writer for the requested format"""
+    if fmt == "parquet":
+        return stream_parquet(chunks)
+    if fmt == "arrow":
+        return stream_arrow(chunks)
+    return stream_csv(chunks)
@@ -0,0 +1,380 @@
+import io
+import os
+import json
+import codecs
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple, Callable, Optional, Union, BinaryIO, Iterator
+import pandas as pd
+from app.document_processor import (
+    detect_encoding, chunk_stream, chunk_records, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+)
+from app.extraction_cache import extraction_cache, cache_key
+
+# Extraction runs in worker processes: PDF parsing is CPU-bound and holds the GIL
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+# PDFs longer than this are split into page ranges extracted in parallel
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 10))
+# Rows parsed per read_csv chunk for uploaded CSVs
+CSV_CHUNK_ROWS = 50000
+# Bytes of a text upload sampled for encoding detection
+ENCODING_SAMPLE_BYTES = 64 * 1024
+# Bytes decoded per read when streaming JSON uploads
+JSON_READ_BYTES = 64 * 1024
+
+# Bump when extraction output changes so cached results from older code are ignored;
+# chunking settings are part of it because they change the chunks produced (PDFs split
+# into page ranges are chunked separately per range, so the range size counts too)
+EXTRACTOR_VERSION = f"1:{CHUNK_MAX_TOKENS}:{CHUNK_OVERLAP_TOKENS}:{PDF_PAGES_PER_TASK}"
+# Formats parsed incrementally, so a lone upload can be streamed from the ingest thread;
+# PDF and DOCX parsing is CPU-bound and stays in the process pool
+STREAMED_EXTENSIONS = (".txt", ".csv", ".json", ".jsonl", ".ndjson")
+
+# A file's chunks (a list, or a ChunkStream read while indexing), or the error that stopped its extraction
+ExtractionResult = Union[List[str], "ChunkStream", Exception]
+
+extract_pool: Optional[ProcessPoolExecutor] = None
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """Return the shared extraction pool, starting it on first use"""
+    global extract_pool
+    if extract_pool is None:
+        extract_pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return extract_pool
+
+def shutdown_extract_pool():
+    """Stop the extraction pool (called on app shutdown)"""
+    global extract_pool
+    if extract_pool is not None:
+        extract_pool.shutdown(wait=False, cancel_futures=True)
+        extract_pool = None
+
+def csv_to_json_chunks(source, chunk_rows: int = CSV_CHUNK_ROWS) -> List[str]:
+    """One JSON object per CSV row, serialized a whole read_csv chunk at a time"""
+    return list(iter_csv_rows(source, chunk_rows))
+
+def iter_csv_rows(source, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[str]:
+    """Yield one JSON object per CSV row, holding at most one read_csv chunk in memory"""
+    for df in pd.read_csv(source, chunksize=chunk_rows):
+        # Same output as row.to_json() per row, without building a Series per row
+        for line in df.to_json(orient="records", lines=True).split("\n"):
+            if line:
+                yield line
+
+def iter_text_lines(fileobj: BinaryIO) -> Iterator[str]:
+    """Yield the non-empty lines of a text file one at a time, in its detected encoding"""
+    encoding = detect_encoding(fileobj.read(ENCODING_SAMPLE_BYTES))
+    if encoding.lower() == "ascii":
+        # An ASCII sample says nothing about the rest of the file; UTF-8 is a superset
+        encoding = "utf-8"
+    fileobj.seek(0)
+    text = io.TextIOWrapper(fileobj, encoding=encoding)
+    try:
+        for line in text:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        # Leave closing the underlying file to its owner
+        text.detach()
+
+def iter_docx_paragraphs(fileobj: BinaryIO) -> Iterator[str]:
+    try:
+        from docx import Document
+        paragraphs = [paragraph.text for paragraph in Document(fileobj).paragraphs]
+    except Exception as e:
+        raise ValueError(f"Error processing DOCX: {str(e)}")
+    for paragraph in paragraphs:
+        if paragraph.strip():
+            yield paragraph.strip()
+
+def iter_json_values(fileobj: BinaryIO, read_bytes: int = JSON_READ_BYTES) -> Iterator[str]:
+    """Yield a JSON array's elements, a single object, or JSON-lines objects, re-serialized.
+
+    The file is decoded incrementally, so only the value being parsed (plus one
+    read block) is held in memory rather than the whole document. While a value
+    is incomplete the read size doubles, so a large value costs a few decode
+    attempts rather than one per block.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, eof = "", 0, False
+    in_array = None  # decided by the first non-whitespace character
+    array_closed = False
+    # Inside an array: whether the next token must be a value (after "[" or ",") and
+    # whether the array may close there (not after ",")
+    expect_value, may_close = True, True
+
+    def fill(size: int):
+        nonlocal buffer, pos, eof
+        block = fileobj.read(size)
+        eof = not block
+        buffer = buffer[pos:] + utf8.decode(block, final=eof)
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                break
+            fill(read_bytes)
+            continue
+
+        if array_closed:
+            raise ValueError("Invalid JSON: unexpected data after the top-level array")
+        if in_array is None:
+            in_array = buffer[pos] == "["
+            if in_array:
+                pos += 1
+                continue
+        if in_array:
+            char = buffer[pos]
+            if char == "]":
+                if not may_close:
+                    raise ValueError("Invalid JSON: trailing comma in array")
+                array_closed = True
+                pos += 1
+                continue
+            if char == ",":
+                if expect_value:
+                    raise ValueError("Invalid JSON: missing value in array")
+                expect_value, may_close = True, False
+                pos += 1
+                continue
+            if not expect_value:
+                raise ValueError("Invalid JSON: missing comma in array")
+
+        size = read_bytes
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Invalid JSON: {e}")
+                end = None
+            # A value touching the end of the buffer may be cut short (e.g. a number), so read more
+            if end is not None and (end < len(buffer) or eof):
+                break
+            fill(size)
+            size *= 2
+
+        if not in_array and not isinstance(value, dict):
+            raise ValueError("Unsupported JSON format.")
+        yield json.dumps(value)
+        pos = end
+        expect_value, may_close = False, True
+
+    if in_array and not array_closed:
+        raise ValueError("Invalid JSON: unterminated array")
+
+def iter_text(filename: str, fileobj: BinaryIO) -> Iterator[str]:
+    """Stream index chunks from an open binary file based on the filename's extension.
+
+    Prose (TXT, PDF, DOCX) is packed into sentence-aligned, overlapping chunks;
+    structured records (CSV rows, JSON objects) stay one chunk per record.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+
+    if ext == ".txt":
+        return chunk_stream(iter_text_lines(fileobj))
+    elif ext == ".csv":
+        return chunk_records(iter_csv_rows(fileobj))
+    elif ext in (".json", ".jsonl", ".ndjson"):
+        return chunk_records(iter_json_values(fileobj))
+    elif ext == ".pdf":
+        return iter(extract_pdf_pages(fileobj))
+    elif ext == ".docx":
+        return chunk_stream(iter_docx_paragraphs(fileobj))
+    else:
+        raise ValueError("Unsupported file type.")
+
+def extract_text(filename: str, fileobj: BinaryIO) -> List[str]:
+    """Extract text chunks from an open binary file based on the filename's extension"""
+    return list(iter_text(filename, fileobj))
+
+def extract_pdf_pages(source, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Chunks of pages [start, stop) of a PDF path or file object"""
+    try:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(source)
+        lines = []
+        for page in reader.pages[start:stop]:
+            text = page.extract_text()
+            if text:
+                lines.extend([line.strip() for line in text.split("\n") if line.strip()])
+    except Exception as e:
+        raise ValueError(f"PDF parsing error: {str(e)}")
+    return list(chunk_stream(lines))
+
+def extract_path(filename: str, path: str) -> List[str]:
+    """Extract a whole spooled file (runs in a worker process)"""
+    with open(path, "rb") as f:
+        return extract_text(filename, f)
+
+class ChunkStream:
+    """Chunks of one spooled file, extracted as the indexer consumes them.
+
+    The first chunk is read up front so unreadable or empty files fail before
+    indexing starts; the rest are read lazily, so memory doesn't grow with the
+    file. With cache_key set, chunks are written to the extraction cache as
+    they pass. Can be iterated once.
+    """
+
+    def __init__(self, filename: str, path: str):
+        self.count = 0
+        self.cache_key: Optional[str] = None
+        self._file = open(path, "rb")
+        try:
+            self._chunks = iter_text(filename, self._file)
+            self._first = next(self._chunks, None)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __bool__(self) -> bool:
+        return self._first is not None
+
+    def _read(self) -> Iterator[str]:
+        try:
+            if self._first is None:
+                return
+            self.count = 1
+            yield self._first
+            for chunk in self._chunks:
+                self.count += 1
+                yield chunk
+        finally:
+            self._file.close()
+
+    def __iter__(self) -> Iterator[str]:
+        if self.cache_key:
+            return extraction_cache.put_iter(self.cache_key, self._read())
+        return self._read()
+
+    def close(self):
+        self._file.close()
+
+def is_streamed(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in STREAMED_EXTENSIONS
+
+def pdf_page_ranges(path: str) -> List[Tuple[int, int]]:
+    """Split a PDF into page ranges of at most PDF_PAGES_PER_TASK pages"""
+    from PyPDF2 import PdfReader
+    page_count = len(PdfReader(path).pages)
+    return [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+
+def plan_tasks(files: List[Tuple[str, str]]) -> List[Tuple[int, int, Callable, tuple]]:
+    """Break files into (file index, part, function, args) tasks; long PDFs become one task per page range"""
+    tasks = []
+    for index, (filename, path) in enumerate(files):
+        ext = os.path.splitext(filename)[1].lower()
+        ranges = None
+        if ext == ".pdf":
+            try:
+                ranges = pdf_page_ranges(path)
+            except Exception:
+                ranges = None  # let the whole-file task report the parsing error
+        if ranges and len(ranges) > 1:
+            # Parts are numbered so page ranges merge back in order
+            tasks.extend((index, part, extract_pdf_pages, (path, start, stop))
+                         for part, (start, stop) in enumerate(ranges))
+        else:
+            tasks.append((index, 0, extract_path, (filename, path)))
+    return tasks
+
+def extract_files(files: List[Tuple[str, str, Optional[str]]],
+                  on_file_done: Optional[Callable[[int, ExtractionResult], None]] = None) -> List[ExtractionResult]:
+    """Extract spooled (filename, path, sha256) files, reusing cached results for known content.
+
+    Files missing from the extraction cache are extracted by extract_uncached
+    and cached on success. Results come back in the order of files.
+    """
+    results: List[Optional[ExtractionResult]] = [None] * len(files)
+    keys = [
+        cache_key(content_hash, os.path.splitext(filename)[1], EXTRACTOR_VERSION) if content_hash else None
+        for filename, _, content_hash in files
+    ]
+
+    misses = []
+    for index, key in enumerate(keys):
+        cached = extraction_cache.get(key) if key else None
+        if cached is None:
+            misses.append(index)
+            continue
+        results[index] = cached
+        if on_file_done:
+            on_file_done(index, cached)
+
+    def extracted(miss: int, result: ExtractionResult):
+        index = misses[miss]
+        results[index] = result
+        if isinstance(result, ChunkStream):
+            # Cached as the indexer reads it
+            result.cache_key = keys[index]
+        elif keys[index] and result and not isinstance(result, Exception):
+            extraction_cache.put(keys[index], result)
+        if on_file_done:
+            on_file_done(index, result)
+
+    if misses:
+        extract_uncached([(files[i][0], files[i][1]) for i in misses], extracted)
+    return results
+
+def extract_uncached(files: List[Tuple[str, str]],
+                     on_file_done: Optional[Callable[[int, ExtractionResult], None]] = None) -> List[ExtractionResult]:
+    """Extract spooled (filename, path) files across the process pool.
+
+    Files and PDF page ranges are extracted concurrently; each file's parts are
+    reassembled in page order, and results come back in the order of files.
+    on_file_done(index, result) is called as soon as a file's parts are all done.
+    A lone TXT, CSV or JSON file comes back as a ChunkStream instead, parsed in
+    the calling (ingest) thread as the indexer reads it; PDF and DOCX files
+    always go to the pool.
+    """
+    tasks = plan_tasks(files)
+    parts: List[List[Optional[List[str]]]] = [[] for _ in files]
+    errors: List[Optional[Exception]] = [None] * len(files)
+    results: List[Optional[ExtractionResult]] = [None] * len(files)
+    for index, _, _, _ in tasks:
+        parts[index].append(None)
+    remaining = [len(p) for p in parts]
+
+    def finish_part(index: int, part: int, chunks: Optional[List[str]], error: Optional[Exception]):
+        if error is not None and errors[index] is None:
+            errors[index] = error
+        parts[index][part] = chunks
+        remaining[index] -= 1
+        if remaining[index] == 0:
+            if errors[index] is not None:
+                results[index] = errors[index]
+            else:
+                results[index] = [chunk for part_chunks in parts[index] for chunk in part_chunks]
+            if on_file_done:
+                on_file_done(index, results[index])
+
+    if len(tasks) == 1 and tasks[0][2] is extract_path and is_streamed(files[0][0]):
+        # A lone text file isn't worth the round trip to a worker process; stream it
+        # straight into the indexer instead of materializing its chunks
+        index, part, _, args = tasks[0]
+        try:
+            results[index] = ChunkStream(*args)
+            if on_file_done:
+                on_file_done(index, results[index])
+        except Exception as e:
+            finish_part(index, part, None, e)
+        return results
+
+    pool = get_extract_pool()
+    futures = {pool.submit(func, *args): (index, part) for index, part, func, args in tasks}
+    for future in as_completed(futures):
+        index, part = futures[future]
+        try:
+            finish_part(index, part, future.result(), None)
+        except Exception as e:
+            finish_part(index, part, None, e)
+    return results
@@ -0,0 +1,157 @@
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Extracted chunks of previously seen uploads, one gzipped JSON file per content hash
+EXTRACTION_CACHE_DIR = "data/extraction_cache"
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+CACHE_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.json\.gz$')
+
+def cache_key(content_hash: str, extension: str, extractor_version: str) -> str:
+    """Combine a file's SHA-256, type and extractor version (incl. chunking settings) into a key"""
+    payload = f"{content_hash}:{extension.lower()}:{extractor_version}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ExtractionCache:
+    """Size-bounded on-disk cache of extraction results.
+
+    Entries are evicted least recently used first (by file mtime, which is
+    touched on every hit) once the directory grows past max_bytes. Like the
+    artifact store, the directory is the source of truth so workers can share it.
+    """
+
+    def __init__(self, directory: str = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes: Optional[int] = None  # computed lazily from the directory
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return the cached chunks for a key and mark them recently used"""
+        path = self.path_for(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                chunks = json.load(f)
+            now = time.time()
+            os.utime(path, (now, now))
+        except (OSError, ValueError):
+            # Missing, evicted by another worker, or a corrupt entry: treat as a miss
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return chunks
+
+    def put(self, key: str, chunks: List[str]):
+        """Store chunks for a key, evicting old entries if the cache is over its size cap"""
+        if self.max_bytes <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        # Write then rename so concurrent readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        self._commit(tmp_path, path)
+
+    def put_iter(self, key: str, chunks: Iterable[str]) -> Iterator[str]:
+        """Yield chunks while writing them to the cache under key.
+
+        The entry is stored only once every chunk has been consumed, so an
+        extraction that fails or is abandoned part way never leaves a partial entry.
+        """
+        if self.max_bytes <= 0:
+            yield from chunks
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        completed = False
+        f = gzip.open(tmp_path, "wt", encoding="utf-8")
+        try:
+            f.write("[")
+            for i, chunk in enumerate(chunks):
+                if i:
+                    f.write(",")
+                json.dump(chunk, f)
+                yield chunk
+            f.write("]")
+            completed = True
+        finally:
+            f.close()
+            if completed:
+                self._commit(tmp_path, path)
+            else:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _commit(self, tmp_path: str, path: str):
+        """Move a finished entry into place, evicting old entries if the cache is over its size cap"""
+        size = os.path.getsize(tmp_path)
+        with self.lock:
+            try:
+                # Re-putting a key replaces its entry, so only the difference counts
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            if self.total_bytes is not None:
+                self.total_bytes += size - replaced
+            if self.total_bytes is None or self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and CACHE_NAME_PATTERN.match(entry.name)]
+
+    def _evict(self):
+        """Delete least recently used entries until under the cap (caller holds the lock)"""
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total_bytes = total
+
+    def clear(self):
+        with self.lock:
+            for entry in self._entries():
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries = self._entries()
+            return {
+                "entries": len(entries),
+                "total_bytes": sum(entry.stat().st_size for entry in entries),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+# Shared cache used by upload extraction
+extraction_cache = ExtractionCache()
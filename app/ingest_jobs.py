@@ -0,0 +1,201 @@
+import os
+import hashlib
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from fastapi import UploadFile
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+# Finished jobs kept for status polling; the oldest are forgotten first
+MAX_FINISHED_JOBS = 200
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+class FileProgress:
+    """Progress of one uploaded file within a job"""
+    __slots__ = ("filename", "path", "size", "content_hash", "status", "chunks", "error", "document_id")
+
+    def __init__(self, filename: str, path: str, size: int, content_hash: str):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        # queued -> processing -> extracted -> completed | duplicate | failed
+        self.status = "queued"
+        self.chunks = 0
+        self.error: Optional[str] = None
+        self.document_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "filename": self.filename,
+            "size": self.size,
+            "content_hash": self.content_hash,
+            "status": self.status,
+            "chunks": self.chunks,
+            "error": self.error,
+            "document_id": self.document_id
+        }
+
+class IngestionJob:
+    """A batch of uploaded files processed in the background"""
+
+    def __init__(self, files: List[FileProgress]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.files = files
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        processed = [f for f in self.files if f.status == "completed"]
+        failed = [f for f in self.files if f.status == "failed"]
+        duplicates = [f for f in self.files if f.status == "duplicate"]
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "files_total": len(self.files),
+            "files_processed": len(processed),
+            "files_failed": len(failed),
+            "files_duplicate": len(duplicates),
+            "chunks_added": sum(f.chunks for f in processed),
+            "failed_files": [f"{f.filename}: {f.error}" for f in failed],
+            "files": [f.to_dict() for f in self.files]
+        }
+
+jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+jobs_lock = threading.Lock()
+ingest_pool: Optional[ThreadPoolExecutor] = None
+
+def get_ingest_pool() -> ThreadPoolExecutor:
+    global ingest_pool
+    if ingest_pool is None:
+        ingest_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    return ingest_pool
+
+def shutdown_ingest_pool():
+    """Stop accepting jobs and let running ones finish (called on app shutdown)"""
+    global ingest_pool
+    if ingest_pool is not None:
+        ingest_pool.shutdown(wait=False)
+        ingest_pool = None
+
+def spool_upload(file: UploadFile) -> Tuple[str, int, str]:
+    """Copy an upload to a temp file (the request's copy is closed after responding).
+
+    Returns the temp path, size and SHA-256 of the content, hashed while copying.
+    """
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    file.file.seek(0)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, delete=False) as tmp:
+        while True:
+            block = file.file.read(SPOOL_CHUNK_BYTES)
+            if not block:
+                break
+            digest.update(block)
+            tmp.write(block)
+        return tmp.name, tmp.tell(), digest.hexdigest()
+
+def _forget_old_jobs():
+    """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS (caller holds jobs_lock)"""
+    finished = [job_id for job_id, job in jobs.items() if job.finished]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del jobs[job_id]
+
+def _run_job(job: IngestionJob, extract_files: Callable, index_documents: Callable,
+             find_duplicate: Optional[Callable] = None):
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    pending = []
+    for progress in job.files:
+        # Files already in the knowledge base skip extraction entirely
+        existing = find_duplicate(progress.content_hash) if find_duplicate else None
+        if existing:
+            progress.document_id = existing["id"]
+            progress.status = "duplicate"
+        else:
+            progress.status = "processing"
+            pending.append(progress)
+
+    def file_extracted(index: int, result):
+        # Called as each file finishes extracting, so polling shows partial progress
+        progress = pending[index]
+        if isinstance(result, Exception):
+            progress.error = getattr(result, "detail", None) or str(result)
+            progress.status = "failed"
+        elif not result:
+            progress.error = "No text content found in file"
+            progress.status = "failed"
+        else:
+            # A streamed result is only counted as it is indexed
+            progress.chunks = len(result) if isinstance(result, list) else 0
+            progress.status = "extracted"
+
+    results = []
+    try:
+        results = extract_files([(f.filename, f.path, f.content_hash) for f in pending], file_extracted) if pending else []
+        extracted = [(i, f) for i, f in enumerate(pending) if f.status == "extracted"]
+        if extracted:
+            # One index update for the whole batch, in upload order
+            records = index_documents([(results[i], f.filename, f.size, f.content_hash) for i, f in extracted])
+            for (i, progress), (record, added) in zip(extracted, records):
+                progress.document_id = record["id"] if record else None
+                if not isinstance(results[i], list):
+                    progress.chunks = results[i].count
+                if added:
+                    progress.status = "completed"
+                else:
+                    # Same content uploaded earlier in this batch or by a concurrent job
+                    progress.chunks = 0
+                    progress.status = "duplicate"
+    except Exception as e:
+        for progress in job.files:
+            if progress.status not in ("failed", "duplicate"):
+                progress.error = str(e)
+                progress.status = "failed"
+    finally:
+        for result in results:
+            # Streamed results that were never read (e.g. duplicates) hold their file open
+            close = getattr(result, "close", None)
+            if close:
+                close()
+        for progress in job.files:
+            try:
+                os.remove(progress.path)
+            except OSError:
+                pass
+    job.finished_at = datetime.utcnow()
+    job.status = "completed" if any(f.status in ("completed", "duplicate") for f in job.files) else "failed"
+
+def submit_ingestion_job(files: List[Tuple[str, str, int, str]], extract_files: Callable, index_documents: Callable,
+                         find_duplicate: Optional[Callable] = None) -> IngestionJob:
+    """Queue spooled (filename, path, size, sha256) files for extraction and a single index update.
+
+    extract_files([(filename, path, sha256)], on_file_done) returns each file's
+    chunks (a list, or a lazily read iterable with a count) or exception, in order;
+    index_documents receives the successful (chunks, filename, size, sha256)
+    tuples and returns (record, added) per file.
+    find_duplicate(sha256) returns the existing record for content already indexed.
+    """
+    job = IngestionJob([FileProgress(filename, path, size, content_hash) for filename, path, size, content_hash in files])
+    with jobs_lock:
+        jobs[job.id] = job
+        _forget_old_jobs()
+    get_ingest_pool().submit(_run_job, job, extract_files, index_documents, find_duplicate)
+    return job
+
+def get_job(job_id: str) -> Optional[IngestionJob]:
+    with jobs_lock:
+        return jobs.get(job_id)
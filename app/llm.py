@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from openai import OpenAI
+from dotenv import load_dotenv
+from app.context_budget import count_tokens, count_message_tokens
+from app.llm_gateway import llm_gateway
+from app.response_cache import normalize_question
+
+load_dotenv()
+
+# "openai" calls the API; "stub" answers locally (no key or network) for offline load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+
+# Stub latency per call: "constant", "uniform" (0 to 2x median), "normal" or "lognormal" around LLM_STUB_LATENCY_MS
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "lognormal").lower()
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", 800))
+# Spread: standard deviation as a fraction of the median (normal) or of log-latency (lognormal)
+LLM_STUB_LATENCY_SIGMA = float(os.getenv("LLM_STUB_LATENCY_SIGMA", 0.5))
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", 42))
+LLM_STUB_RESPONSE_WORDS = int(os.getenv("LLM_STUB_RESPONSE_WORDS", 60))
+# Filter JSON the stub returns for portfolio queries: a file mapping queries to filter objects,
+# and the filters used for queries not in it
+LLM_STUB_FILTERS_FILE = os.getenv("LLM_STUB_FILTERS_FILE")
+LLM_STUB_DEFAULT_FILTERS = os.getenv("LLM_STUB_DEFAULT_FILTERS", '{"Size (SF)": {"gt": 10000}}')
+
+STUB_WORDS = (
+    "the property offers strong rent per square foot relative to comparable suites in the "
+    "portfolio with stable commission income and flexible floor plans for tenants"
+).split()
+
+class Completion:
+    """Text of a completion with the provider's token counts (None when not reported)"""
+    __slots__ = ("text", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, text: str, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+class OpenAIBackend:
+    """Chat completions from the OpenAI API"""
+
+    def __init__(self, model: str = LLM_MODEL):
+        self.model = model
+        # Retries are left to the LLM gateway
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0
+        )
+
+    def complete(self, messages: List[Dict[str, str]], purpose: str = "chat", subject: Optional[str] = None) -> Completion:
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages
+        )
+        usage = completion.usage
+        return Completion(
+            completion.choices[0].message.content,
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None
+        )
+
+class StubBackend:
+    """Local stand-in for the provider with a configurable latency distribution.
+
+    Outputs depend only on the prompt, so runs are repeatable: filter parsing
+    returns canned JSON, everything else a filler reply of a fixed length.
+    Latencies are drawn from a seeded generator.
+    """
+
+    def __init__(self, latency: str = LLM_STUB_LATENCY, latency_ms: float = LLM_STUB_LATENCY_MS,
+                 sigma: float = LLM_STUB_LATENCY_SIGMA, seed: int = LLM_STUB_SEED,
+                 response_words: int = LLM_STUB_RESPONSE_WORDS):
+        if latency not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown stub latency distribution: {latency}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.response_words = response_words
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.canned_filters = self.load_canned_filters()
+        self.default_filters = json.loads(LLM_STUB_DEFAULT_FILTERS)
+
+    @staticmethod
+    def load_canned_filters() -> Dict[str, dict]:
+        if not LLM_STUB_FILTERS_FILE:
+            return {}
+        with open(LLM_STUB_FILTERS_FILE, "r", encoding="utf-8") as f:
+            return {normalize_question(query): filters for query, filters in json.load(f).items()}
+
+    def sample_latency(self) -> float:
+        """Seconds the next call takes"""
+        with self.rng_lock:
+            if self.latency == "constant":
+                ms = self.latency_ms
+            elif self.latency == "uniform":
+                ms = self.rng.uniform(0, 2 * self.latency_ms)
+            elif self.latency == "normal":
+                ms = self.rng.gauss(self.latency_ms, self.sigma * self.latency_ms)
+            else:
+                ms = self.latency_ms * self.rng.lognormvariate(0, self.sigma)
+        return max(0.0, ms) / 1000
+
+    def reply(self, messages: List[Dict[str, str]], purpose: str, subject: Optional[str]) -> str:
+        if purpose == "filters":
+            return json.dumps(self.canned_filters.get(normalize_question(subject or ""), self.default_filters))
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+        words = [STUB_WORDS[(digest[i % len(digest)] + i) % len(STUB_WORDS)] for i in range(self.response_words)]
+        return f"[stub {purpose}] " + " ".join(words) + "."
+
+    def complete(self, messages: List[Dict[str, str]], purpose: str = "chat", subject: Optional[str] = None) -> Completion:
+        time.sleep(self.sample_latency())
+        text = self.reply(messages, purpose, subject)
+        return Completion(text, sum(count_message_tokens(m) for m in messages), count_tokens(text))
+
+BACKENDS = {"openai": OpenAIBackend, "stub": StubBackend}
+
+backend = None
+backend_lock = threading.Lock()
+
+def get_llm_backend():
+    """The configured backend, created on first use"""
+    global backend
+    if backend is None:
+        with backend_lock:
+            if backend is None:
+                if LLM_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND}")
+                backend = BACKENDS[LLM_BACKEND]()
+    return backend
+
+def complete(messages: List[Dict[str, str]], purpose: str = "chat", subject: Optional[str] = None) -> Completion:
+    """Run a chat completion on the configured backend through the LLM gateway.
+
+    purpose ("chat", "filters", "summary", "session_summary") and subject (the
+    user's query) are hints the stub uses to pick its canned output.
+    """
+    return llm_gateway.call(get_llm_backend().complete, messages, purpose, subject)
@@ -0,0 +1,184 @@
+import os
+import time
+import math
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+import openai
+
+# Outbound LLM requests allowed at once across the whole process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# Sustained request rate to the provider (0 disables rate limiting) and the burst allowed above it
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", 5))
+LLM_BURST = int(os.getenv("LLM_BURST", 10))
+# A call that can't get a slot and a rate token within this long is rejected with a 503
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 10))
+# Retries of rate-limit, timeout, connection and 5xx errors, with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 0.5))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 8))
+# Recent wait times kept for the averages in stats()
+WAIT_SAMPLES = 1000
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+class LLMOverloaded(Exception):
+    """No capacity for an LLM call within the queue timeout; the app answers 503 with Retry-After"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM capacity exhausted, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Take one token, sleeping until one is available; False if that would pass the deadline"""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """Full-jitter exponential backoff, no shorter than a Retry-After the provider sent"""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, min(LLM_BACKOFF_MAX_SECONDS, float(response.headers.get("retry-after"))))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+class LLMGateway:
+    """Admission control for outbound LLM calls.
+
+    A call waits for a concurrency slot and a rate token for at most
+    queue_timeout seconds, then is rejected with LLMOverloaded so the server
+    sheds load instead of piling requests onto a rate-limited provider.
+    Transient provider errors are retried with backoff; the slot is released
+    while backing off, and once retries run out the call is shed with
+    LLMOverloaded too. Blocking: call from worker threads, not the event loop.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate: float = LLM_RATE_PER_SECOND,
+                 burst: int = LLM_BURST, queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.retries = 0
+        self.failures = 0
+        self.waits: "deque[float]" = deque(maxlen=WAIT_SAMPLES)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a concurrency slot and one rate token for the duration of one provider request"""
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        with self.lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        admitted = False
+        try:
+            if self.slots.acquire(timeout=self.queue_timeout):
+                admitted = self.bucket.acquire(deadline)
+                if not admitted:
+                    self.slots.release()
+        finally:
+            waited = time.monotonic() - start
+            with self.lock:
+                self.waiting -= 1
+                self.waits.append(waited)
+                if admitted:
+                    self.in_flight += 1
+                else:
+                    self.rejected += 1
+        if not admitted:
+            raise LLMOverloaded(self.retry_after())
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+    def retry_after(self) -> float:
+        """Seconds a rejected client should wait: long enough for the current queue to drain at the rate limit"""
+        if self.bucket.rate > 0:
+            return max(1.0, math.ceil((self.waiting + self.in_flight) / self.bucket.rate))
+        return max(1.0, math.ceil(self.queue_timeout))
+
+    def call(self, request: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run request(*args, **kwargs) through admission control, retrying transient errors.
+
+        Raises LLMOverloaded if no capacity frees up in time or transient errors
+        outlast the retries; other errors propagate unchanged.
+        """
+        with self.lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            with self.slot():
+                try:
+                    return request(*args, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        with self.lock:
+                            self.failures += 1
+                        # The provider is still overloaded or unreachable: answer 503 with Retry-After
+                        raise LLMOverloaded(self.retry_after()) from e
+                    error = e
+            delay = backoff_delay(attempt, error)
+            attempt += 1
+            with self.lock:
+                self.retries += 1
+            print(f"LLM call failed ({type(error).__name__}), retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            waits = sorted(self.waits)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "rate_per_second": self.bucket.rate,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "retries": self.retries,
+                "failures": self.failures,
+                "avg_wait_ms": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+                "p95_wait_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0
+            }
+
+# Shared by every module that calls the LLM, so the limits are process-wide
+llm_gateway = LLMGateway()
@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.chat import chat_endpoint
 from app.chat_history import history_router
@@ -6,6 +7,14 @@ from app.crm_routes import crm_router
 from app.upload import upload_router
 from app.analyze import analyze_router
 from app.rag import load_knowledge_base
+from app.charts import shutdown_chart_pool
+from app.artifacts import artifact_store
+from app.dataset import start_dataset_watcher, stop_dataset_watcher
+from app.ingest_jobs import shutdown_ingest_pool
+from app.extraction import shutdown_extract_pool
+from app.shards import shutdown_shard_pool
+from app.session_memory import shutdown_summary_pool
+from app.llm_gateway import llm_gateway, LLMOverloaded
 
 app = FastAPI(
     title="RAG-Enabled Real Estate AI Assistant",
@@ -22,6 +31,15 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """Shed load when the LLM gateway's queue is full instead of failing with a 500"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The assistant is busy, please retry shortly"},
+        headers={"Retry-After": str(int(exc.retry_after))}
+    )
+
 # Load knowledge base on startup
 @app.on_event("startup")
 async def startup_event():
@@ -31,6 +49,23 @@ async def startup_event():
         print("Knowledge base loaded successfully")
     except Exception as e:
         print(f"Warning: Failed to load knowledge base: {e}")
+    
+    # Periodically evict expired or excess charts/CSVs
+    artifact_store.start_janitor()
+    
+    # Pick up edits to the property CSV without restarting the server
+    start_dataset_watcher()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background worker pools"""
+    shutdown_chart_pool()
+    artifact_store.stop_janitor()
+    stop_dataset_watcher()
+    shutdown_ingest_pool()
+    shutdown_extract_pool()
+    shutdown_shard_pool()
+    shutdown_summary_pool()
 
 app.include_router(chat_endpoint, prefix="/chat", tags=["Chat"])
 app.include_router(history_router, prefix="/history", tags=["Chat History"])
@@ -48,9 +83,19 @@ async def root():
             "chat_history": "/history/sessions/",
             "portfolio_analysis": "/analyze/analyze_portfolio",
             "portfolio_stats": "/analyze/portfolio_stats",
+            "portfolio_aggregate": "/analyze/aggregate",
+            "portfolio_export": "/analyze/export",
+            "reload_dataset": "/analyze/admin/reload_dataset",
             "upload_docs": "/chat/upload_docs",
+            "upload_job_status": "/chat/upload_jobs/{job_id}",
             "list_docs": "/chat/documents",
             "delete_doc": "/chat/documents/{doc_id}",
+            "llm_stats": "/llm_stats",
             "api_docs": "/docs"
         }
     }
+
+@app.get("/llm_stats")
+async def llm_stats():
+    """Queue depth, wait times, retries and rejections of outbound LLM calls"""
+    return llm_gateway.stats()
@@ -0,0 +1,267 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+import pandas as pd
+from app.dataset import (
+    clean_dataframe, aggregate_dataframe, optional_float, parse_percentile,
+    NUMERIC_COLUMNS
+)
+
+# One on-disk copy of the listings shared by every worker process
+PROPERTY_DB_PATH = os.getenv("PROPERTY_DB_PATH", "data/properties.db")
+PROPERTY_TABLE = "properties"
+# Each build goes into its own table, properties_v{version}; this many of the newest are
+# kept so workers still on an older version can finish their queries and notice the change
+PROPERTY_TABLE_VERSIONS_KEPT = int(os.getenv("PROPERTY_TABLE_VERSIONS_KEPT", 3))
+INGEST_CHUNK_ROWS = 50000
+INDEXED_COLUMNS = ['Size (SF)', 'Rent/SF/Year', 'GCI On 3 Years', 'Property Address']
+
+# Filter operators understood by the analyzer, as SQL comparisons
+SQL_OPERATORS = {'gt': '>', 'lt': '<', 'eq': '=', 'gte': '>=', 'lte': '<='}
+SQL_AGGREGATES = {'sum': 'SUM', 'mean': 'AVG', 'count': 'COUNT', 'min': 'MIN', 'max': 'MAX'}
+
+def quote_identifier(name: str) -> str:
+    """Quote a column name for SQL (names are also checked against the table schema)"""
+    return '"' + name.replace('"', '""') + '"'
+
+def connect(db_path: str = PROPERTY_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    # WAL lets readers keep using the old table while a rebuild is in progress
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def column_sql_type(series: pd.Series, column: str) -> str:
+    if column in NUMERIC_COLUMNS or pd.api.types.is_float_dtype(series):
+        return "REAL"
+    if pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    return "TEXT"
+
+def table_for_version(version: int) -> str:
+    return f"{PROPERTY_TABLE}_v{int(version)}"
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+def drop_old_tables(conn: sqlite3.Connection, version: int):
+    """Drop property tables older than the PROPERTY_TABLE_VERSIONS_KEPT newest (and the unversioned legacy table)"""
+    prefix = f"{PROPERTY_TABLE}_v"
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        if name == PROPERTY_TABLE:
+            old = True
+        elif name.startswith(prefix) and name[len(prefix):].isdigit():
+            old = int(name[len(prefix):]) <= version - max(1, PROPERTY_TABLE_VERSIONS_KEPT)
+        else:
+            old = False
+        if old:
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+
+def read_meta(conn: sqlite3.Connection) -> Optional[Tuple[int, str, float, str]]:
+    """(version, source path, source mtime, loaded_at) of the current table, if built"""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS dataset_meta "
+        "(id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER, source_path TEXT, source_mtime REAL, loaded_at TEXT)"
+    )
+    return conn.execute("SELECT version, source_path, source_mtime, loaded_at FROM dataset_meta WHERE id = 1").fetchone()
+
+def rebuild_table(conn: sqlite3.Connection, csv_path: str, version: int, mtime: float):
+    """Stream the CSV into a new typed, indexed table for this version and make it current (caller holds the write lock).
+
+    Tables are never replaced in place, so a SQLiteDataset keeps reading the
+    rows of the version it reports even while other workers rebuild.
+    """
+    table = table_for_version(version)
+    conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+    insert_sql = None
+    for chunk in pd.read_csv(csv_path, chunksize=INGEST_CHUNK_ROWS):
+        cleaned = clean_dataframe(chunk)
+        if insert_sql is None:
+            column_defs = ", ".join(
+                f"{quote_identifier(column)} {column_sql_type(cleaned[column], column)}"
+                for column in cleaned.columns
+            )
+            conn.execute(f"CREATE TABLE {table} ({column_defs})")
+            placeholders = ", ".join("?" for _ in cleaned.columns)
+            insert_sql = f"INSERT INTO {table} VALUES ({placeholders})"
+        rows = cleaned.astype(object).where(pd.notna(cleaned), None).itertuples(index=False, name=None)
+        conn.executemany(insert_sql, rows)
+
+    if insert_sql is None:
+        raise ValueError(f"Dataset at {csv_path} has no rows")
+
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    for i, column in enumerate(INDEXED_COLUMNS):
+        if column in columns:
+            conn.execute(f"CREATE INDEX idx_{table}_{i} ON {table} ({quote_identifier(column)})")
+
+    conn.execute(
+        "INSERT OR REPLACE INTO dataset_meta (id, version, source_path, source_mtime, loaded_at) VALUES (1, ?, ?, ?, ?)",
+        (version, csv_path, mtime, datetime.utcnow().isoformat())
+    )
+    drop_old_tables(conn, version)
+
+def open_sqlite_dataset(csv_path: str, force: bool = False, db_path: str = PROPERTY_DB_PATH) -> "SQLiteDataset":
+    """Return a dataset view over the SQLite table, (re)building it if the CSV changed"""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    mtime = os.path.getmtime(csv_path)
+
+    conn = connect(db_path)
+    conn.isolation_level = None  # explicit transactions below
+    try:
+        # IMMEDIATE takes the write lock, so concurrent workers rebuild at most once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = read_meta(conn)
+            up_to_date = (meta is not None and meta[1] == csv_path and meta[2] == mtime
+                          and table_exists(conn, table_for_version(meta[0])))
+            if force or not up_to_date:
+                version = (meta[0] if meta else 0) + 1
+                rebuild_table(conn, csv_path, version, mtime)
+                meta = read_meta(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    version, _, source_mtime, loaded_at = meta
+    return SQLiteDataset(db_path, version, csv_path, source_mtime, datetime.fromisoformat(loaded_at))
+
+class SQLiteDataset:
+    """Property dataset backed by an indexed SQLite table.
+
+    Mirrors the query methods of app.dataset.DatasetSnapshot, translating the
+    analyzer's filter JSON into parameterized SQL so only matching rows are
+    ever loaded into memory. Every query reads the table of this view's
+    version, so results always match the version used in cache keys.
+    """
+    __slots__ = ("db_path", "version", "table", "path", "mtime", "loaded_at", "_columns", "_row_count")
+
+    def __init__(self, db_path: str, version: int, path: str, mtime: float, loaded_at: datetime):
+        self.db_path = db_path
+        self.version = version
+        self.table = table_for_version(version)
+        self.path = path
+        self.mtime = mtime
+        self.loaded_at = loaded_at
+        conn = connect(db_path)
+        try:
+            self._columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")]
+            self._row_count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    @property
+    def identity(self) -> str:
+        """Names the data across restarts: the version lives in the shared database, and
+        the source mtime tells apart tables rebuilt after the database was recreated"""
+        return f"sqlite:{self.version}:{self.mtime}"
+
+    @property
+    def empty(self) -> bool:
+        return self._row_count == 0
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def row_count(self) -> int:
+        return self._row_count
+
+    def where_clause(self, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """Translate filter JSON into a WHERE clause and its parameters"""
+        clauses, params = [], []
+        for column, conditions in filters.items():
+            if column not in self._columns:
+                continue
+            for operator, value in conditions.items():
+                if operator in SQL_OPERATORS:
+                    clauses.append(f"{quote_identifier(column)} {SQL_OPERATORS[operator]} ?")
+                    params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def select_sql(self, filters: Dict[str, Any], columns: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        selected = ", ".join(quote_identifier(c) for c in columns if c in self._columns) if columns else "*"
+        where, params = self.where_clause(filters)
+        return f"SELECT {selected} FROM {self.table}{where} ORDER BY rowid", params
+
+    def filter(self, filters: Dict[str, Any], columns: Optional[List[str]] = None) -> pd.DataFrame:
+        sql, params = self.select_sql(filters, columns)
+        conn = connect(self.db_path)
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    def iter_filtered(self, filters: Dict[str, Any], chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Yield matching rows in chunks straight from the cursor (at least one, possibly empty)"""
+        sql, params = self.select_sql(filters)
+        conn = connect(self.db_path)
+        try:
+            yielded = False
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_rows):
+                yielded = True
+                yield chunk
+            if not yielded:
+                yield pd.DataFrame(columns=self._columns)
+        finally:
+            conn.close()
+
+    def aggregate(self, group_by: List[str], metrics: Dict[str, List[str]], filters: Dict[str, Any]) -> pd.DataFrame:
+        """GROUP BY in SQL; percentiles fall back to pandas over just the needed columns"""
+        if any(parse_percentile(op) is not None for ops in metrics.values() for op in ops):
+            needed = list(dict.fromkeys(group_by + list(metrics)))
+            return aggregate_dataframe(self.filter(filters, needed), group_by, metrics)
+
+        selects = [quote_identifier(column) for column in group_by] + ["COUNT(*) AS row_count"]
+        for column, operations in metrics.items():
+            for operation in dict.fromkeys(operations):
+                alias = quote_identifier(f"{column}_{operation}")
+                selects.append(f"{SQL_AGGREGATES[operation]}({quote_identifier(column)}) AS {alias}")
+
+        where, params = self.where_clause(filters)
+        sql = f"SELECT {', '.join(selects)} FROM {self.table}{where}"
+        if group_by:
+            # Order groups by first appearance, like pandas groupby(sort=False)
+            group_columns = ", ".join(quote_identifier(column) for column in group_by)
+            sql += f" GROUP BY {group_columns} ORDER BY MIN(rowid)"
+
+        conn = connect(self.db_path)
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    def describe(self, columns: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+        selects = []
+        for column in columns:
+            quoted = quote_identifier(column)
+            selects.extend([f"AVG({quoted})", f"MIN({quoted})", f"MAX({quoted})"])
+        conn = connect(self.db_path)
+        try:
+            row = conn.execute(f"SELECT {', '.join(selects)} FROM {self.table}").fetchone()
+        finally:
+            conn.close()
+        return {
+            column: {
+                "mean": optional_float(row[3 * i]),
+                "min": optional_float(row[3 * i + 1]),
+                "max": optional_float(row[3 * i + 2])
+            }
+            for i, column in enumerate(columns)
+        }
+
+    def is_stale(self) -> bool:
+        """Whether the CSV changed or another worker rebuilt the table since this view was opened"""
+        if os.path.getmtime(self.path) != self.mtime:
+            return True
+        conn = connect(self.db_path)
+        try:
+            meta = read_meta(conn)
+        finally:
+            conn.close()
+        return meta is not None and meta[0] != self.version
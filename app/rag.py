@@ -2,163 +2,66 @@ import os
 import pickle
 import json
 import re
-from typing import List, Dict, Any
+import hashlib
+import threading
+import itertools
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.decomposition import TruncatedSVD
+from app.ann import IVFIndex, ANN_MIN_VECTORS
+from app.shards import ShardedIndex, assign_shards, RETRIEVAL_SHARDS
+from app.chunk_store import ChunkStore
+from app.document_registry import DocumentRegistry
 import numpy as np
 from datetime import datetime
 
-# Knowledge base path
-DOCS_FILE = "data/documents.pkl"
-VECTORIZER_FILE = "data/vectorizer.pkl"
-TFIDF_MATRIX_FILE = "data/tfidf_matrix.pkl"
-METADATA_FILE = "data/document_metadata.pkl"
-
-# Global in-memory storage
-document_chunks = []
-vectorizer = None
-tfidf_matrix = None
-document_metadata = []  # New: Store metadata for each document
-
-def load_knowledge_base():
-    """Load the knowledge base from disk"""
-    global document_chunks, vectorizer, tfidf_matrix, document_metadata
-    
-    if os.path.exists(DOCS_FILE) and os.path.exists(VECTORIZER_FILE) and os.path.exists(TFIDF_MATRIX_FILE):
-        # Load documents
-        with open(DOCS_FILE, "rb") as f:
-            document_chunks = pickle.load(f)
-        
-        # Load vectorizer
-        with open(VECTORIZER_FILE, "rb") as f:
-            vectorizer = pickle.load(f)
-        
-        # Load TF-IDF matrix
-        with open(TFIDF_MATRIX_FILE, "rb") as f:
-            tfidf_matrix = pickle.load(f)
-        
-        # Load metadata if exists
-        if os.path.exists(METADATA_FILE):
-            with open(METADATA_FILE, "rb") as f:
-                document_metadata = pickle.load(f)
-        else:
-            document_metadata = []
-    else:
-        # Initialize empty knowledge base
-        document_chunks = []
-        vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        tfidf_matrix = None
-        document_metadata = []
-
-def save_knowledge_base():
-    """Save the knowledge base to disk"""
-    # Create data directory if it doesn't exist
-    os.makedirs("data", exist_ok=True)
-    
-    # Save documents
-    with open(DOCS_FILE, "wb") as f:
-        pickle.dump(document_chunks, f)
-    
-    # Save vectorizer
-    with open(VECTORIZER_FILE, "wb") as f:
-        pickle.dump(vectorizer, f)
-    
-    # Save TF-IDF matrix
-    if tfidf_matrix is not None:
-        with open(TFIDF_MATRIX_FILE, "wb") as f:
-            pickle.dump(tfidf_matrix, f)
-    
-    # Save metadata
-    with open(METADATA_FILE, "wb") as f:
-        pickle.dump(document_metadata, f)
+# Knowledge base files, relative to a namespace's directory
+DOCS_FILE = "documents.pkl"
+VECTORIZER_FILE = "vectorizer.pkl"
+TFIDF_MATRIX_FILE = "tfidf_matrix.pkl"
+METADATA_FILE = "document_metadata.pkl"
+CHUNK_INDEX_FILE = "chunk_index.pkl"
+LSA_MODEL_FILE = "lsa_model.pkl"
+DENSE_VECTORS_FILE = "dense_vectors.npy"
+ANN_INDEX_FILE = "ann_index.npz"
 
-def add_documents(texts: List[str], filename: str = None, file_size: int = None):
-    """Add documents to the knowledge base with metadata tracking"""
-    global document_chunks, vectorizer, tfidf_matrix, document_metadata
-    
-    # Track the starting index for this document's chunks
-    start_index = len(document_chunks)
-    
-    # Add new documents
-    document_chunks.extend(texts)
-    
-    # Create metadata entry for this document
-    if filename:
-        metadata_entry = {
-            "id": len(document_metadata) + 1,
-            "filename": filename,
-            "upload_date": datetime.utcnow().isoformat(),
-            "chunk_count": len(texts),
-            "chunk_start_index": start_index,
-            "chunk_end_index": start_index + len(texts) - 1,
-            "file_size": file_size or 0,
-            "total_text_length": sum(len(text) for text in texts)
-        }
-        document_metadata.append(metadata_entry)
-    
-    # Refit vectorizer and compute TF-IDF matrix
-    if len(document_chunks) > 0:
-        tfidf_matrix = vectorizer.fit_transform(document_chunks)
-        save_knowledge_base()
+# The shared default namespace keeps the original data/ layout; tenant namespaces
+# (a user or team id) each get their own directory under data/namespaces/
+DATA_DIR = "data"
+NAMESPACES_DIR = "data/namespaces"
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}$')
+# Namespaces kept in memory at once; the least recently used is unloaded first
+MAX_LOADED_NAMESPACES = int(os.getenv("MAX_LOADED_NAMESPACES", 16))
 
-def get_documents_list():
-    """Get list of all uploaded documents with metadata"""
-    global document_metadata
-    return document_metadata
+# "lexical" scores TF-IDF only; "dense" uses LSA (TruncatedSVD) vectors; "hybrid" fuses both
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "lexical").lower()
+LSA_COMPONENTS = int(os.getenv("LSA_COMPONENTS", 128))
+# Weight of the dense score in hybrid mode (the lexical score gets the rest)
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", 0.5))
 
-def delete_document(document_id: int):
-    """Delete a document and its chunks from the knowledge base"""
-    global document_chunks, vectorizer, tfidf_matrix, document_metadata
-    
-    # Find the document metadata
-    doc_to_delete = None
-    doc_index = None
-    for i, doc in enumerate(document_metadata):
-        if doc["id"] == document_id:
-            doc_to_delete = doc
-            doc_index = i
-            break
-    
-    if not doc_to_delete:
-        raise ValueError(f"Document with ID {document_id} not found")
-    
-    # Remove chunks from document_chunks
-    start_idx = doc_to_delete["chunk_start_index"]
-    end_idx = doc_to_delete["chunk_end_index"]
-    chunks_to_remove = end_idx - start_idx + 1
-    
-    # Remove the chunks
-    del document_chunks[start_idx:end_idx + 1]
-    
-    # Remove metadata entry
-    del document_metadata[doc_index]
-    
-    # Update chunk indices for remaining documents
-    for doc in document_metadata:
-        if doc["chunk_start_index"] > end_idx:
-            doc["chunk_start_index"] -= chunks_to_remove
-            doc["chunk_end_index"] -= chunks_to_remove
-    
-    # Refit vectorizer and compute TF-IDF matrix if documents remain
-    if len(document_chunks) > 0:
-        tfidf_matrix = vectorizer.fit_transform(document_chunks)
-    else:
-        tfidf_matrix = None
-    
-    save_knowledge_base()
-    return {"message": f"Document '{doc_to_delete['filename']}' deleted successfully"}
+# Index generations are unique across instances (see SearchIndex)
+generation_counter = itertools.count(1)
 
-def clear_knowledge_base():
-    """Clear all documents from the knowledge base"""
-    global document_chunks, vectorizer, tfidf_matrix, document_metadata
-    
-    document_chunks = []
-    document_metadata = []
-    tfidf_matrix = None
-    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-    
-    save_knowledge_base()
-    return {"message": "Knowledge base cleared successfully"}
+def chunk_hash(text: str) -> str:
+    """Fingerprint a chunk, ignoring case and whitespace differences"""
+    normalized = " ".join(text.split()).casefold()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+def dense_enabled() -> bool:
+    return RETRIEVAL_MODE in ("dense", "hybrid")
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero) as contiguous float32"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms)
 
 def extract_numerical_criteria(query: str):
     """Extract numerical criteria from query"""
@@ -222,81 +125,675 @@ def filter_by_criteria(documents: List[str], criteria: dict) -> List[str]:
     
     return filtered_docs
 
-def query_knowledge_base(query: str, top_k: int = 3) -> List[str]:
-    """Query the knowledge base for relevant documents with improved numerical handling"""
-    global document_chunks, vectorizer, tfidf_matrix
+def top_indices_by_score(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+def new_vectorizer() -> TfidfVectorizer:
+    return TfidfVectorizer(max_features=1000, stop_words='english')
+
+def fit_dense(tfidf_matrix) -> Tuple[Optional[TruncatedSVD], Optional[np.ndarray]]:
+    """Project a TF-IDF matrix onto its top singular vectors (latent semantic analysis)"""
+    if not dense_enabled() or tfidf_matrix is None:
+        return None, None
     
-    if not document_chunks or tfidf_matrix is None:
-        return []
+    # TruncatedSVD needs fewer components than either dimension of the matrix
+    n_components = min(LSA_COMPONENTS, tfidf_matrix.shape[0] - 1, tfidf_matrix.shape[1] - 1)
+    if n_components < 1:
+        return None, None
     
-    try:
-        # Extract numerical criteria from query
-        criteria = extract_numerical_criteria(query)
+    lsa_model = TruncatedSVD(n_components=n_components, random_state=42)
+    return lsa_model, normalize_rows(lsa_model.fit_transform(tfidf_matrix))
+
+def build_ann_index(dense_vectors: Optional[np.ndarray]) -> Optional[IVFIndex]:
+    """Cluster the dense vectors into an IVF index when brute force gets too slow"""
+    if dense_vectors is not None and len(dense_vectors) >= ANN_MIN_VECTORS:
+        return IVFIndex().build(dense_vectors)
+    return None
+
+def build_sharded_index(tfidf_matrix, dense_vectors: Optional[np.ndarray], chunk_owners) -> Optional[ShardedIndex]:
+    """Split the chunk rows into RETRIEVAL_SHARDS shards by owning document"""
+    if RETRIEVAL_SHARDS > 1 and tfidf_matrix is not None:
+        assignments = assign_shards(chunk_owners, RETRIEVAL_SHARDS)
+        return ShardedIndex(tfidf_matrix, dense_vectors, assignments, RETRIEVAL_SHARDS)
+    return None
+
+class SearchIndex:
+    """Everything a query reads, fitted together and never modified afterwards.
+
+    Writers build a new one off to the side and publish it with a single
+    assignment to KnowledgeBase.index; a query reads that attribute once, so it
+    can't pair a vectorizer with a matrix or chunk list from another refit.
+    chunks may be the store writers keep appending to (edits replace it with a
+    new store), but the index only ever reads its first size positions.
+    """
+    __slots__ = ("chunks", "chunk_hashes", "size", "vectorizer", "tfidf_matrix", "lsa_model",
+                 "dense_vectors", "ann_index", "sharded_index", "generation")
+
+    def __init__(self, chunks: ChunkStore, chunk_hashes: List[str], vectorizer: TfidfVectorizer, tfidf_matrix=None,
+                 lsa_model: Optional[TruncatedSVD] = None, dense_vectors: Optional[np.ndarray] = None,
+                 ann_index: Optional[IVFIndex] = None, sharded_index: Optional[ShardedIndex] = None):
+        self.chunks = chunks
+        self.chunk_hashes = tuple(chunk_hashes)
+        self.size = len(chunks)
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        # LSA projection of tfidf_matrix: one unit-length float32 row per chunk, stored contiguously
+        self.lsa_model = lsa_model
+        self.dense_vectors = dense_vectors
+        self.ann_index = ann_index  # IVF index over dense_vectors once the corpus reaches ANN_MIN_VECTORS
+        self.sharded_index = sharded_index  # row-partitioned copy of both, scored in parallel when RETRIEVAL_SHARDS > 1
+        # Unique across instances, so a namespace reloaded after eviction never repeats a generation
+        self.generation = next(generation_counter)
+
+    def rank_chunks(self, query: str, search_k: int, mode: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and scores of the search_k chunks most similar to the query, best first.
+        
+        lexical: TF-IDF cosine. dense: LSA cosine from one float32 matrix-vector
+        product, or from the IVF index for large corpora. hybrid: a weighted blend
+        of both (with the IVF index, over the union of both candidate sets).
+        Exhaustive scoring is fanned out across shards when sharding is enabled.
+        """
+        mode = (mode or RETRIEVAL_MODE).lower()
+        tfidf_matrix, lsa_model, dense_vectors, ann_index = self.tfidf_matrix, self.lsa_model, self.dense_vectors, self.ann_index
+        query_vector = self.vectorizer.transform([query])
+        
+        if self.sharded_index is not None and (mode == "lexical" or dense_vectors is None or ann_index is None):
+            query_dense = None
+            if mode != "lexical" and dense_vectors is not None:
+                query_dense = normalize_rows(lsa_model.transform(query_vector))[0]
+            return self.sharded_index.search(query_vector, query_dense, mode, search_k, HYBRID_DENSE_WEIGHT)
+        
+        if mode == "lexical" or dense_vectors is None:
+            # Cosine similarity against the TF-IDF matrix
+            lexical = cosine_similarity(query_vector, tfidf_matrix).flatten()
+            top = top_indices_by_score(lexical, search_k)
+            return top, lexical[top]
+        
+        query_dense = normalize_rows(lsa_model.transform(query_vector))[0]
+        if mode == "dense":
+            if ann_index is not None:
+                ids, scores = ann_index.search(query_dense, search_k, dense_vectors)
+                return ids, np.maximum(scores, 0.0)
+            dense = np.maximum(dense_vectors @ query_dense, 0.0)
+            top = top_indices_by_score(dense, search_k)
+            return top, dense[top]
+        
+        lexical = cosine_similarity(query_vector, tfidf_matrix).flatten()
+        if ann_index is not None:
+            dense_ids, _ = ann_index.search(query_dense, search_k, dense_vectors)
+            candidates = np.union1d(top_indices_by_score(lexical, search_k), dense_ids)
+            dense = np.maximum(dense_vectors[candidates] @ query_dense, 0.0)
+            fused = (1.0 - HYBRID_DENSE_WEIGHT) * lexical[candidates] + HYBRID_DENSE_WEIGHT * dense
+            top = top_indices_by_score(fused, search_k)
+            return candidates[top], fused[top]
+        
+        dense = np.maximum(dense_vectors @ query_dense, 0.0)
+        fused = (1.0 - HYBRID_DENSE_WEIGHT) * lexical + HYBRID_DENSE_WEIGHT * dense
+        top = top_indices_by_score(fused, search_k)
+        return top, fused[top]
+
+    def retrieve(self, query: str, top_k: int = 3, mode: str = None) -> List[int]:
+        """Positions of the chunks relevant to a query, with improved numerical handling"""
+        document_chunks = self.chunks
+        if not self.size or self.tfidf_matrix is None:
+            return []
         
-        # Transform query using the same vectorizer
-        query_vector = vectorizer.transform([query])
+        try:
+            # Extract numerical criteria from query
+            criteria = extract_numerical_criteria(query)
+            
+            # For numerical queries, search through a much larger pool
+            if criteria:
+                # Search through top 50% of documents for numerical queries
+                search_k = max(min(self.size // 2, 100), 1)
+                top_indices, top_scores = self.rank_chunks(query, search_k, mode)
+                
+                # Get all candidate documents with very low threshold for numerical queries
+                candidates = []
+                for idx, score in zip(top_indices, top_scores):
+                    if score > 0.01:  # Very low threshold for numerical queries
+                        candidates.append((int(idx), document_chunks[idx]))
+                
+                # Apply numerical filtering
+                filtered_docs = set(filter_by_criteria([doc for _, doc in candidates], criteria))
+                if filtered_docs:
+                    return [idx for idx, doc in candidates if doc in filtered_docs][:top_k]
+                
+                # If no exact matches, return closest matches with explanation
+                # Let the AI know these are close matches, not exact matches
+                return [idx for idx, _ in candidates[:top_k]]
+            else:
+                # For non-numerical queries, use standard approach
+                search_k = top_k
+                top_indices, top_scores = self.rank_chunks(query, search_k, mode)
+            
+            # If no numerical criteria or no matches, return top similarity matches
+            relevant = []
+            for idx, score in zip(top_indices, top_scores):
+                if score > 0.1:  # Standard threshold for non-numerical queries
+                    relevant.append(int(idx))
+                    if len(relevant) >= top_k:
+                        break
+            
+            # If we found good matches, return them
+            if relevant:
+                return relevant
+            
+            # If no good matches found, use lower threshold to get some results
+            # This helps with queries like "high GCI potential" that might not match well
+            for idx, score in zip(top_indices, top_scores):
+                if score > 0.05:  # Lower threshold for fallback
+                    relevant.append(int(idx))
+                    if len(relevant) >= top_k:
+                        break
+            
+            return relevant
+        
+        except Exception as e:
+            print(f"Error querying knowledge base: {e}")
+            return []
+
+class KnowledgeBase:
+    """One namespace's chunks, TF-IDF/dense indexes and document metadata, persisted in a directory"""
+
+    def __init__(self, namespace: str, directory: str):
+        self.namespace = namespace
+        self.directory = directory
+        self.document_chunks = ChunkStore()
+        self.documents = DocumentRegistry()
         
-        # Calculate cosine similarity
-        similarities = cosine_similarity(query_vector, tfidf_matrix).flatten()
+        # Content hash and reference count of each stored chunk (parallel to document_chunks).
+        # A chunk counts one reference for the document that stored it and one for each
+        # document that uploaded an identical chunk; it is removed when the count hits zero.
+        self.chunk_hashes: List[str] = []
+        self.chunk_refcounts = array("i")
+        self.chunk_hash_index: Dict[str, int] = {}  # hash -> position in document_chunks
         
-        # For numerical queries, search through a much larger pool
-        if criteria:
-            # Search through top 50% of documents for numerical queries
-            search_k = min(len(document_chunks) // 2, 100)
-            top_indices = np.argsort(similarities)[-search_k:][::-1]
+        # What queries read; replaced (never modified) on every load, refit and clear
+        self.index = SearchIndex(self.document_chunks, self.chunk_hashes, new_vectorizer())
+        
+        # Serializes changes (uploads run in background worker threads)
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.evicted = False  # set once unloaded; writers must fetch a fresh instance
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        with self.lock:
+            if not self.loaded:
+                self.load()
+                self.loaded = True
+
+    def load(self):
+        """Load the knowledge base from disk"""
+        if os.path.exists(self.path(DOCS_FILE)) and os.path.exists(self.path(VECTORIZER_FILE)) and os.path.exists(self.path(TFIDF_MATRIX_FILE)):
+            # Load documents
+            with open(self.path(DOCS_FILE), "rb") as f:
+                self.document_chunks = pickle.load(f)
+            if not isinstance(self.document_chunks, ChunkStore):
+                # Saved before the compact store: a plain list of strings
+                self.document_chunks = ChunkStore(self.document_chunks)
             
-            # Get all candidate documents with very low threshold for numerical queries
-            candidate_docs = []
-            for idx in top_indices:
-                if similarities[idx] > 0.01:  # Very low threshold for numerical queries
-                    candidate_docs.append(document_chunks[idx])
+            # Load vectorizer
+            with open(self.path(VECTORIZER_FILE), "rb") as f:
+                vectorizer = pickle.load(f)
             
-            # Apply numerical filtering
-            filtered_docs = filter_by_criteria(candidate_docs, criteria)
-            if filtered_docs:
-                return filtered_docs[:top_k]
+            # Load TF-IDF matrix
+            with open(self.path(TFIDF_MATRIX_FILE), "rb") as f:
+                tfidf_matrix = pickle.load(f)
             
-            # If no exact matches, return closest matches with explanation
-            # Let the AI know these are close matches, not exact matches
-            return candidate_docs[:top_k]
+            # Load metadata if exists
+            if os.path.exists(self.path(METADATA_FILE)):
+                with open(self.path(METADATA_FILE), "rb") as f:
+                    self.documents = pickle.load(f)
+                if not isinstance(self.documents, DocumentRegistry):
+                    # Saved before the registry: a plain list of metadata
+                    self.documents = DocumentRegistry.from_list(self.documents)
+            else:
+                self.documents = DocumentRegistry()
+        else:
+            # Initialize empty knowledge base
+            self.document_chunks = ChunkStore()
+            vectorizer = new_vectorizer()
+            tfidf_matrix = None
+            self.documents = DocumentRegistry()
+        
+        self.documents.rebuild_chunk_owners(len(self.document_chunks))
+        self.load_chunk_index()
+        lsa_model, dense_vectors, ann_index = self.load_dense_index(tfidf_matrix)
+        self.index = SearchIndex(
+            self.document_chunks, self.chunk_hashes, vectorizer, tfidf_matrix, lsa_model, dense_vectors, ann_index,
+            build_sharded_index(tfidf_matrix, dense_vectors, self.documents.chunk_owners)
+        )
+
+    def load_chunk_index(self):
+        """Load chunk hashes and reference counts, rebuilding them if missing or out of date"""
+        index = None
+        if os.path.exists(self.path(CHUNK_INDEX_FILE)):
+            with open(self.path(CHUNK_INDEX_FILE), "rb") as f:
+                index = pickle.load(f)
+        
+        if index is not None and len(index["hashes"]) == len(self.document_chunks):
+            self.chunk_hashes = index["hashes"]
+            self.chunk_refcounts = array("i", index["refcounts"])
+        else:
+            # Knowledge bases saved before deduplication: each chunk is referenced once
+            self.chunk_hashes = [chunk_hash(text) for text in self.document_chunks]
+            self.chunk_refcounts = array("i", [1]) * len(self.document_chunks)
+        self.rebuild_chunk_hash_index()
+
+    def rebuild_chunk_hash_index(self):
+        self.chunk_hash_index = {}
+        for i, h in enumerate(self.chunk_hashes):
+            self.chunk_hash_index.setdefault(h, i)
+
+    def load_dense_index(self, tfidf_matrix) -> Tuple[Optional[TruncatedSVD], Optional[np.ndarray], Optional[IVFIndex]]:
+        """Load the LSA model, chunk vectors and IVF index, rebuilding them if missing or out of date"""
+        if not dense_enabled() or tfidf_matrix is None:
+            return None, None, None
+        
+        lsa_model, dense_vectors, ann_index = None, None, None
+        if os.path.exists(self.path(LSA_MODEL_FILE)) and os.path.exists(self.path(DENSE_VECTORS_FILE)):
+            with open(self.path(LSA_MODEL_FILE), "rb") as f:
+                lsa_model = pickle.load(f)
+            dense_vectors = np.load(self.path(DENSE_VECTORS_FILE))
+        
+        if dense_vectors is None or dense_vectors.shape[0] != tfidf_matrix.shape[0]:
+            lsa_model, dense_vectors = fit_dense(tfidf_matrix)
+            ann_index = build_ann_index(dense_vectors)
+            self.save_dense_index(lsa_model, dense_vectors, ann_index)
+            return lsa_model, dense_vectors, ann_index
+        
+        if os.path.exists(self.path(ANN_INDEX_FILE)):
+            ann_index = IVFIndex.load(self.path(ANN_INDEX_FILE))
+        wanted = len(dense_vectors) >= ANN_MIN_VECTORS
+        if wanted != (ann_index is not None) or (ann_index is not None and ann_index.size != len(dense_vectors)):
+            ann_index = build_ann_index(dense_vectors)
+            self.save_dense_index(lsa_model, dense_vectors, ann_index)
+        return lsa_model, dense_vectors, ann_index
+
+    def save_dense_index(self, lsa_model: Optional[TruncatedSVD], dense_vectors: Optional[np.ndarray],
+                         ann_index: Optional[IVFIndex]):
+        os.makedirs(self.directory, exist_ok=True)
+        stale = []
+        if lsa_model is None or dense_vectors is None:
+            stale = [LSA_MODEL_FILE, DENSE_VECTORS_FILE, ANN_INDEX_FILE]
         else:
-            # For non-numerical queries, use standard approach
-            search_k = top_k
-            top_indices = np.argsort(similarities)[-search_k:][::-1]
+            with open(self.path(LSA_MODEL_FILE), "wb") as f:
+                pickle.dump(lsa_model, f)
+            np.save(self.path(DENSE_VECTORS_FILE), dense_vectors)
+            if ann_index is not None:
+                ann_index.save(self.path(ANN_INDEX_FILE))
+            else:
+                stale = [ANN_INDEX_FILE]
+        
+        for name in stale:
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+
+    def refit_index(self):
+        """Fit a new vectorizer and every derived index on the current chunks, then publish them (caller holds the lock).
+        
+        Everything is built off to the side; queries keep using the previous
+        index until the single assignment at the end.
+        """
+        vectorizer = new_vectorizer()
+        tfidf_matrix = vectorizer.fit_transform(self.document_chunks) if len(self.document_chunks) > 0 else None
+        lsa_model, dense_vectors = fit_dense(tfidf_matrix)
+        ann_index = build_ann_index(dense_vectors)
+        self.index = SearchIndex(
+            self.document_chunks, self.chunk_hashes, vectorizer, tfidf_matrix, lsa_model, dense_vectors, ann_index,
+            build_sharded_index(tfidf_matrix, dense_vectors, self.documents.chunk_owners)
+        )
+
+    def save(self):
+        """Save the knowledge base to disk"""
+        index = self.index
+        # Create the namespace directory if it doesn't exist
+        os.makedirs(self.directory, exist_ok=True)
+        
+        # Save documents
+        with open(self.path(DOCS_FILE), "wb") as f:
+            pickle.dump(self.document_chunks, f)
+        
+        # Save vectorizer
+        with open(self.path(VECTORIZER_FILE), "wb") as f:
+            pickle.dump(index.vectorizer, f)
+        
+        # Save TF-IDF matrix
+        if index.tfidf_matrix is not None:
+            with open(self.path(TFIDF_MATRIX_FILE), "wb") as f:
+                pickle.dump(index.tfidf_matrix, f)
         
-        # If no numerical criteria or no matches, return top similarity matches
-        relevant_docs = []
-        for idx in top_indices:
-            if similarities[idx] > 0.1:  # Standard threshold for non-numerical queries
-                relevant_docs.append(document_chunks[idx])
-                if len(relevant_docs) >= top_k:
-                    break
+        # Save metadata
+        with open(self.path(METADATA_FILE), "wb") as f:
+            pickle.dump(self.documents, f)
         
-        # If we found good matches, return them
-        if relevant_docs:
-            return relevant_docs
+        # Save chunk hashes and reference counts
+        with open(self.path(CHUNK_INDEX_FILE), "wb") as f:
+            pickle.dump({"hashes": self.chunk_hashes, "refcounts": self.chunk_refcounts}, f)
         
-        # If no good matches found, use lower threshold to get some results
-        # This helps with queries like "high GCI potential" that might not match well
-        for idx in top_indices:
-            if similarities[idx] > 0.05:  # Lower threshold for fallback
-                relevant_docs.append(document_chunks[idx])
-                if len(relevant_docs) >= top_k:
-                    break
+        # Save LSA model and dense vectors
+        self.save_dense_index(index.lsa_model, index.dense_vectors, index.ann_index)
+
+    def find_document_by_hash(self, content_hash: str):
+        """Return the metadata of an uploaded file with this SHA-256, if any"""
+        return self.documents.find_by_hash(content_hash)
+
+    def add_document_batch(self, documents: List[Tuple[Iterable[str], str, int, str]]) -> List[Tuple[Dict[str, Any], bool]]:
+        """Add several files' (texts, filename, file_size, content_hash) with a single refit and save.
         
-        return relevant_docs
+        Returns (metadata, added) per file; a file whose content hash is already in
+        the knowledge base is not added again and returns the existing record.
+        Chunks identical to ones already stored are referenced instead of copied.
+        If reading a document's texts fails, the whole batch is undone and the error re-raised.
+        """
+        results = []
+        with self.lock:
+            batch_start = len(self.document_chunks)
+            referenced_positions = []
+            try:
+                self._add_documents(documents, results, referenced_positions)
+            except Exception:
+                self.discard_batch(batch_start, [record.id for record, added in results if added and record],
+                                   referenced_positions)
+                raise
+            
+            # Refit vectorizer and compute TF-IDF matrix once for the whole batch
+            if any(added for _, added in results) and len(self.document_chunks) > 0:
+                self.refit_index()
+                self.save()
+        return results
+
+    def _add_documents(self, documents: List[Tuple[Iterable[str], str, int, str]],
+                       results: List[Tuple[Any, bool]], referenced_positions: List[int]):
+        """Append each document's chunks and metadata (caller holds the lock)"""
+        for texts, filename, file_size, content_hash in documents:
+            existing = self.find_document_by_hash(content_hash) if content_hash else None
+            if existing:
+                results.append((existing, False))
+                continue
+            
+            # Track the starting index for this document's chunks
+            start_index = len(self.document_chunks)
+            
+            # Add new chunks; texts may be a generator, so count while consuming it
+            total_text_length = 0
+            referenced = []  # stored on the record, in first-seen order
+            referenced_set = set()
+            duplicate_chunks = 0
+            for text in texts:
+                total_text_length += len(text)
+                h = chunk_hash(text)
+                position = self.chunk_hash_index.get(h)
+                if position is None:
+                    self.chunk_hash_index[h] = len(self.document_chunks)
+                    self.document_chunks.append(text)
+                    self.chunk_hashes.append(h)
+                    self.chunk_refcounts.append(1)
+                    continue
+                
+                # Identical chunk already stored: reference it once per document
+                duplicate_chunks += 1
+                if position < start_index and h not in referenced_set:
+                    referenced_set.add(h)
+                    referenced.append(h)
+                    self.chunk_refcounts[position] += 1
+                    referenced_positions.append(position)
+            chunk_count = len(self.document_chunks) - start_index
+            
+            # Create metadata entry for this document
+            metadata_entry = None
+            if filename:
+                metadata_entry = self.documents.create(
+                    filename=filename,
+                    upload_date=datetime.utcnow().isoformat(),
+                    chunk_count=chunk_count,
+                    chunk_start_index=start_index,
+                    chunk_end_index=start_index + chunk_count - 1,
+                    file_size=file_size or 0,
+                    total_text_length=total_text_length,
+                    content_hash=content_hash,
+                    duplicate_chunks=duplicate_chunks,
+                    referenced_chunks=referenced
+                )
+            self.documents.assign_chunks(metadata_entry.id if metadata_entry else 0, chunk_count)
+            results.append((metadata_entry, True))
+
+    def discard_batch(self, start: int, created: List[int], referenced_positions: List[int]):
+        """Undo a partly added batch: drop its records and chunks and release its references (caller holds the lock)"""
+        for position in referenced_positions:
+            self.chunk_refcounts[position] -= 1
+        for document_id in created:
+            self.documents.remove(document_id)
+        if len(self.document_chunks) > start:
+            self.document_chunks = self.document_chunks.select(range(start))
+            del self.chunk_hashes[start:]
+            del self.chunk_refcounts[start:]
+            del self.documents.chunk_owners[start:]
+            self.rebuild_chunk_hash_index()
+
+    def get_documents_list(self, filename: Optional[str] = None, uploaded_after: Optional[datetime] = None,
+                           uploaded_before: Optional[datetime] = None, offset: int = 0,
+                           limit: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """Uploaded documents with metadata, filtered and paged; returns (total matches, page)"""
+        total, page = self.documents.search(filename, uploaded_after, uploaded_before, offset, limit)
+        # Chunk hash lists are internal bookkeeping
+        return total, [{k: v for k, v in doc.to_dict().items() if k != "referenced_chunks"} for doc in page]
+
+    def delete_document(self, document_id: int):
+        """Delete a document and its chunks from the knowledge base"""
+        with self.lock:
+            # Find the document metadata
+            doc_to_delete = self.documents.get(document_id)
+            if not doc_to_delete:
+                raise ValueError(f"Document with ID {document_id} not found")
+            
+            # Drop this document's references to its own and shared chunks
+            start_idx = doc_to_delete.chunk_start_index
+            end_idx = doc_to_delete.chunk_end_index
+            released = list(range(start_idx, end_idx + 1))
+            released.extend(self.chunk_hash_index[h] for h in doc_to_delete.referenced_chunks if h in self.chunk_hash_index)
+            for i in released:
+                self.chunk_refcounts[i] -= 1
+            
+            # Remove chunks nobody references any more; chunks other documents share stay
+            removed = sorted(i for i in set(released) if self.chunk_refcounts[i] <= 0)
+            removed_set = set(removed)
+            keep = [i for i in range(len(self.document_chunks)) if i not in removed_set]
+            self.document_chunks = self.document_chunks.select(keep)
+            self.chunk_hashes = [self.chunk_hashes[i] for i in keep]
+            self.chunk_refcounts = array("i", (self.chunk_refcounts[i] for i in keep))
+            self.rebuild_chunk_hash_index()
+            
+            # Remove metadata entry
+            self.documents.remove(document_id)
+            
+            # Shift chunk indices for remaining documents past the removed chunks
+            for doc in self.documents:
+                shift = bisect_left(removed, doc.chunk_start_index)
+                doc.chunk_start_index -= shift
+                doc.chunk_end_index -= shift
+            self.documents.rebuild_chunk_owners(len(self.document_chunks))
+            
+            # Refit vectorizer and compute TF-IDF matrix if documents remain
+            self.refit_index()
+            
+            self.save()
+            return {"message": f"Document '{doc_to_delete.filename}' deleted successfully"}
+
+    def clear(self):
+        """Clear all documents from the knowledge base"""
+        with self.lock:
+            self.document_chunks = ChunkStore()
+            # Keep counting ids so ids of cleared documents are never reused
+            self.documents = DocumentRegistry(next_id=self.documents.next_id)
+            self.chunk_hashes = []
+            self.chunk_refcounts = array("i")
+            self.chunk_hash_index = {}
+            self.index = SearchIndex(self.document_chunks, self.chunk_hashes, new_vectorizer())
+            
+            self.save()
+            return {"message": "Knowledge base cleared successfully"}
+
+    def rank_chunks(self, query: str, search_k: int, mode: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and scores of the search_k chunks most similar to the query, best first"""
+        return self.index.rank_chunks(query, search_k, mode)
+
+    def retrieve(self, query: str, top_k: int = 3, mode: str = None) -> List[int]:
+        """Positions of the chunks relevant to a query in the current index"""
+        return self.index.retrieve(query, top_k, mode)
+
+    def query(self, query: str, top_k: int = 3, mode: str = None) -> List[str]:
+        """Query the knowledge base for relevant documents"""
+        index = self.index
+        return [index.chunks[idx] for idx in index.retrieve(query, top_k, mode)]
+
+    def query_with_ids(self, query: str, top_k: int = 3, mode: str = None) -> Tuple[Optional[int], List[str], List[str]]:
+        """Relevant chunks with their content hashes and the generation of the index they came from"""
+        index = self.index
+        positions = index.retrieve(query, top_k, mode)
+        texts = [index.chunks[idx] for idx in positions]
+        hashes = [index.chunk_hashes[idx] for idx in positions]
+        return index.generation, hashes, texts
+
+    def stats(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "namespace": self.namespace,
+            "total_documents": index.size,
+            "has_vectorizer": index.vectorizer is not None,
+            "has_tfidf_matrix": index.tfidf_matrix is not None,
+            "retrieval_mode": RETRIEVAL_MODE,
+            "dense_dimensions": int(index.dense_vectors.shape[1]) if index.dense_vectors is not None else 0,
+            "ann_lists": len(index.ann_index.centroids) if index.ann_index is not None else 0,
+            "shards": len(index.sharded_index) if index.sharded_index is not None else 1,
+            "generation": index.generation
+        }
+
+# Loaded knowledge bases by namespace, least recently used first
+knowledge_bases: "OrderedDict[str, KnowledgeBase]" = OrderedDict()
+knowledge_bases_lock = threading.Lock()
+
+def resolve_namespace(namespace: Optional[str] = None) -> str:
+    """Map a missing namespace to the shared default and reject names unsafe as directory names"""
+    namespace = namespace or DEFAULT_NAMESPACE
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(f"Invalid namespace '{namespace}'")
+    return namespace
+
+def namespace_directory(namespace: str) -> str:
+    if namespace == DEFAULT_NAMESPACE:
+        return DATA_DIR
+    return os.path.join(NAMESPACES_DIR, namespace)
+
+def _evict_namespaces():
+    """Unload least recently used namespaces beyond MAX_LOADED_NAMESPACES (caller holds knowledge_bases_lock).
     
-    except Exception as e:
-        print(f"Error querying knowledge base: {e}")
-        return []
+    A knowledge base in the middle of a write is skipped; everything else is
+    already on disk, so dropping it only costs a reload on next use.
+    """
+    for namespace in list(knowledge_bases)[:-1]:
+        if len(knowledge_bases) <= MAX_LOADED_NAMESPACES:
+            break
+        kb = knowledge_bases[namespace]
+        if not kb.lock.acquire(blocking=False):
+            continue
+        try:
+            kb.evicted = True
+            del knowledge_bases[namespace]
+        finally:
+            kb.lock.release()
+
+def get_knowledge_base(namespace: Optional[str] = None) -> KnowledgeBase:
+    """Return a namespace's knowledge base, loading it from disk on first use"""
+    namespace = resolve_namespace(namespace)
+    with knowledge_bases_lock:
+        kb = knowledge_bases.get(namespace)
+        if kb is None:
+            kb = KnowledgeBase(namespace, namespace_directory(namespace))
+            knowledge_bases[namespace] = kb
+            _evict_namespaces()
+        else:
+            knowledge_bases.move_to_end(namespace)
+    # Loading happens outside the registry lock so other namespaces aren't blocked by it
+    kb.ensure_loaded()
+    return kb
+
+@contextmanager
+def locked_knowledge_base(namespace: Optional[str] = None) -> Iterator[KnowledgeBase]:
+    """Hold a namespace's write lock, retrying if the instance was evicted before the lock was taken"""
+    while True:
+        kb = get_knowledge_base(namespace)
+        with kb.lock:
+            if not kb.evicted:
+                yield kb
+                return
+
+def load_knowledge_base(namespace: Optional[str] = None) -> KnowledgeBase:
+    """(Re)load a namespace's knowledge base from disk"""
+    namespace = resolve_namespace(namespace)
+    with knowledge_bases_lock:
+        stale = knowledge_bases.pop(namespace, None)
+    if stale is not None:
+        with stale.lock:
+            stale.evicted = True
+    return get_knowledge_base(namespace)
+
+def add_documents(texts: Iterable[str], filename: str = None, file_size: int = None, content_hash: str = None,
+                  namespace: Optional[str] = None):
+    """Add documents to the knowledge base with metadata tracking"""
+    return add_document_batch([(texts, filename, file_size, content_hash)], namespace)[0]
+
+def add_document_batch(documents: List[Tuple[Iterable[str], str, int, str]],
+                       namespace: Optional[str] = None) -> List[Tuple[Dict[str, Any], bool]]:
+    """Add (texts, filename, file_size, content_hash) files to a namespace; see KnowledgeBase.add_document_batch"""
+    with locked_knowledge_base(namespace) as kb:
+        results = kb.add_document_batch(documents)
+    return [(record.to_dict() if record else None, added) for record, added in results]
+
+def find_document_by_hash(content_hash: str, namespace: Optional[str] = None):
+    """Return the metadata of an uploaded file with this SHA-256, if any"""
+    record = get_knowledge_base(namespace).find_document_by_hash(content_hash)
+    return record.to_dict() if record else None
+
+def get_documents_list(namespace: Optional[str] = None, filename: Optional[str] = None,
+                       uploaded_after: Optional[datetime] = None, uploaded_before: Optional[datetime] = None,
+                       offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    """Uploaded documents with metadata, filtered and paged; returns (total matches, page)"""
+    return get_knowledge_base(namespace).get_documents_list(filename, uploaded_after, uploaded_before, offset, limit)
+
+def delete_document(document_id: int, namespace: Optional[str] = None):
+    """Delete a document and its chunks from the knowledge base"""
+    with locked_knowledge_base(namespace) as kb:
+        return kb.delete_document(document_id)
+
+def clear_knowledge_base(namespace: Optional[str] = None):
+    """Clear all documents from the knowledge base"""
+    with locked_knowledge_base(namespace) as kb:
+        return kb.clear()
+
+def query_knowledge_base(query: str, top_k: int = 3, mode: str = None, namespace: Optional[str] = None) -> List[str]:
+    """Query a namespace's knowledge base; only that namespace's chunks are scored"""
+    return get_knowledge_base(namespace).query(query, top_k, mode)
+
+def query_knowledge_base_with_ids(query: str, top_k: int = 3, mode: str = None,
+                                  namespace: Optional[str] = None) -> Tuple[Optional[int], List[str], List[str]]:
+    """Query a namespace and return (index generation, chunk content hashes, chunk texts)"""
+    return get_knowledge_base(namespace).query_with_ids(query, top_k, mode)
 
-def get_knowledge_base_stats():
+def get_knowledge_base_stats(namespace: Optional[str] = None):
     """Get statistics about the knowledge base"""
-    return {
-        "total_documents": len(document_chunks),
-        "has_vectorizer": vectorizer is not None,
-        "has_tfidf_matrix": tfidf_matrix is not None
-    }
-
-# Load knowledge base on import
-load_knowledge_base()
+    stats = get_knowledge_base(namespace).stats()
+    with knowledge_bases_lock:
+        stats["loaded_namespaces"] = len(knowledge_bases)
+    return stats
@@ -0,0 +1,98 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# How long a cached chat answer may be served; 0 disables the cache
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", 3600))
+# Least recently used answers are evicted beyond this many
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 1000))
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Openings and references that make a question lean on earlier turns ("what about the second one?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(and|also|so|then|what about|how about)\b"
+    r"|\b(it|its|they|them|their|those|these|this one|that one|he|she|him|his|her|the same|"
+    r"above|previous|earlier|first one|second one|last one)\b"
+)
+
+def normalize_question(question: str) -> str:
+    """Case, spacing and trailing punctuation don't change what a question asks"""
+    return WHITESPACE_PATTERN.sub(" ", question.casefold()).strip().rstrip("?!. ")
+
+def is_follow_up(question: str) -> bool:
+    """Whether a question probably needs the earlier conversation to be understood"""
+    return FOLLOW_UP_PATTERN.search(normalize_question(question)) is not None
+
+def cache_key(namespace: str, generation: int, question: str, chunk_ids: List[str]) -> str:
+    """Combine the namespace, its index generation, the normalized question and the ids of
+    the retrieved chunks (the context the answer is built on) into a key"""
+    h = hashlib.sha256()
+    for part in (namespace, str(generation), normalize_question(question), ",".join(chunk_ids)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ResponseCache:
+    """In-memory LRU cache of answers that expire ttl_seconds after they are stored.
+
+    Keys include the knowledge base generation, which changes on every upload,
+    delete or clear, so answers built on old context are never looked up again;
+    they just age out.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl_seconds: float = CHAT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+# Shared cache used by the chat endpoint
+chat_response_cache = ResponseCache()
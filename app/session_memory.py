@@ -0,0 +1,112 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from app.crm import SessionLocal, ChatSession, Conversation
+from app.context_budget import truncate_to_tokens
+from app.llm import complete
+
+load_dotenv()
+
+# Messages sent verbatim on every turn; anything older reaches the prompt only through the summary
+RECENT_MESSAGES = int(os.getenv("RECENT_MESSAGES", 6))
+# Fold older messages into the summary once this many turns (user + assistant pairs) have piled up
+SUMMARY_EVERY_TURNS = int(os.getenv("SUMMARY_EVERY_TURNS", 4))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 300))
+# Each message is clipped to this many tokens in the summarization prompt
+SUMMARY_INPUT_MESSAGE_TOKENS = 400
+
+summary_pool: Optional[ThreadPoolExecutor] = None
+# Sessions with an update queued or running, so a busy session isn't summarized twice at once
+pending_sessions = set()
+pending_lock = threading.Lock()
+
+def get_summary_pool() -> ThreadPoolExecutor:
+    global summary_pool
+    if summary_pool is None:
+        summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+    return summary_pool
+
+def shutdown_summary_pool():
+    """Stop summarizing (called on app shutdown)"""
+    global summary_pool
+    if summary_pool is not None:
+        summary_pool.shutdown(wait=False, cancel_futures=True)
+        summary_pool = None
+
+def recent_history(db, session: ChatSession) -> List[Dict[str, str]]:
+    """The last RECENT_MESSAGES messages of a session, oldest first"""
+    messages = (
+        db.query(Conversation)
+        .filter(Conversation.session_id == session.id)
+        .order_by(Conversation.timestamp.desc())
+        .limit(RECENT_MESSAGES)
+        .all()
+    )
+    return [{"role": msg.role, "content": msg.message} for msg in reversed(messages)]
+
+def unsummarized_count(db, session: ChatSession) -> int:
+    """Messages older than the recent window that the summary doesn't cover yet"""
+    total = db.query(Conversation).filter(Conversation.session_id == session.id).count()
+    return max(0, total - RECENT_MESSAGES - (session.summarized_messages or 0))
+
+def maybe_update_summary(db, session: ChatSession):
+    """Queue a background summary update once SUMMARY_EVERY_TURNS turns have left the recent window"""
+    if unsummarized_count(db, session) < 2 * SUMMARY_EVERY_TURNS:
+        return
+    with pending_lock:
+        if session.id in pending_sessions:
+            return
+        pending_sessions.add(session.id)
+    get_summary_pool().submit(update_summary, session.id)
+
+def build_summary_prompt(summary: Optional[str], messages: List[Conversation]) -> str:
+    transcript = "\n".join(
+        f"{msg.role}: {truncate_to_tokens(msg.message, SUMMARY_INPUT_MESSAGE_TOKENS)}" for msg in messages
+    )
+    return f"""
+You maintain a running summary of a conversation between a commercial real estate assistant and a user.
+
+Current summary:
+{summary or "(none yet)"}
+
+New messages:
+{transcript}
+
+Rewrite the summary to include the new messages. Keep the user's requirements, properties and figures discussed, and open questions. Use at most {SUMMARY_MAX_TOKENS // 2} words.
+"""
+
+def update_summary(session_id: str):
+    """Fold the messages that have left the recent window into the session's summary"""
+    db = SessionLocal()
+    try:
+        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if not session:
+            return
+        summarized = session.summarized_messages or 0
+        count = unsummarized_count(db, session)
+        if count <= 0:
+            return
+        messages = (
+            db.query(Conversation)
+            .filter(Conversation.session_id == session.id)
+            .order_by(Conversation.timestamp.asc())
+            .offset(summarized)
+            .limit(count)
+            .all()
+        )
+        completion = complete(
+            [{"role": "user", "content": build_summary_prompt(session.summary, messages)}],
+            purpose="session_summary"
+        )
+        session.summary = truncate_to_tokens(completion.text.strip(), SUMMARY_MAX_TOKENS)
+        session.summarized_messages = summarized + len(messages)
+        db.commit()
+    except Exception as e:
+        # The next turn retries; until then the prompt uses the previous summary
+        print(f"Session summary error: {e}")
+    finally:
+        db.close()
+        with pending_lock:
+            pending_sessions.discard(session_id)
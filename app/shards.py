@@ -0,0 +1,107 @@
+import os
+import zlib
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+# Number of shards the chunk index is split into for scoring (1 disables sharding)
+RETRIEVAL_SHARDS = int(os.getenv("RETRIEVAL_SHARDS", 1))
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", min(RETRIEVAL_SHARDS, os.cpu_count() or 1)))
+# A document's chunks are hashed to shards in blocks of this many, so one large
+# upload (e.g. the property CSV) is still spread across shards
+SHARD_BLOCK_CHUNKS = int(os.getenv("SHARD_BLOCK_CHUNKS", 256))
+
+shard_pool: Optional[ThreadPoolExecutor] = None
+
+def get_shard_pool() -> ThreadPoolExecutor:
+    """Return the shared shard scoring pool, starting it on first use"""
+    global shard_pool
+    if shard_pool is None:
+        shard_pool = ThreadPoolExecutor(max_workers=max(1, RETRIEVAL_WORKERS), thread_name_prefix="shard")
+    return shard_pool
+
+def shutdown_shard_pool():
+    """Stop the shard scoring pool (called on app shutdown)"""
+    global shard_pool
+    if shard_pool is not None:
+        shard_pool.shutdown(wait=False)
+        shard_pool = None
+
+def shard_for(key: str, shards: int) -> int:
+    """Stable shard number for a key (crc32, unlike hash(), is the same in every process)"""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+def assign_shards(chunk_owners: Sequence[int], shards: int) -> np.ndarray:
+    """Shard number of every chunk, from the id of the document that stored it.
+
+    Keys are (document id, block of SHARD_BLOCK_CHUNKS positions); chunks with
+    no document (owner 0) are hashed by block alone.
+    """
+    owners = np.asarray(chunk_owners, dtype=np.int64)
+    if len(owners) == 0:
+        return np.empty(0, dtype=np.int32)
+    blocks = np.arange(len(owners)) // SHARD_BLOCK_CHUNKS
+    keys, inverse = np.unique(np.stack([owners, blocks], axis=1), axis=0, return_inverse=True)
+    numbers = np.array([shard_for(f"{owner}:{block}", shards) for owner, block in keys.tolist()], dtype=np.int32)
+    return numbers[inverse.reshape(-1)]
+
+class Shard:
+    """A subset of chunk rows with their slices of the TF-IDF matrix and dense vectors"""
+    __slots__ = ("rows", "tfidf", "dense")
+
+    def __init__(self, rows: np.ndarray, tfidf, dense: Optional[np.ndarray]):
+        self.rows = rows
+        self.tfidf = tfidf
+        self.dense = dense
+
+    def top_k(self, query_vector, query_dense: Optional[np.ndarray], mode: str, k: int,
+              dense_weight: float) -> List[Tuple[float, int]]:
+        """(score, chunk index) of this shard's k best chunks"""
+        if mode == "lexical" or query_dense is None:
+            scores = cosine_similarity(query_vector, self.tfidf).flatten()
+        elif mode == "dense":
+            scores = np.maximum(self.dense @ query_dense, 0.0)
+        else:
+            lexical = cosine_similarity(query_vector, self.tfidf).flatten()
+            dense = np.maximum(self.dense @ query_dense, 0.0)
+            scores = (1.0 - dense_weight) * lexical + dense_weight * dense
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return list(zip(scores[top].tolist(), self.rows[top].tolist()))
+
+class ShardedIndex:
+    """Chunk index split into shards that are scored concurrently.
+
+    Each shard returns its own top k; the global top k is merged from those
+    with a heap, which gives the same result as scoring the whole matrix.
+    """
+
+    def __init__(self, tfidf_matrix, dense_vectors: Optional[np.ndarray], assignments: np.ndarray, shards: int):
+        self.shards: List[Shard] = []
+        for shard in range(shards):
+            rows = np.flatnonzero(assignments == shard)
+            if len(rows):
+                dense = np.ascontiguousarray(dense_vectors[rows]) if dense_vectors is not None else None
+                self.shards.append(Shard(rows, tfidf_matrix[rows], dense))
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def search(self, query_vector, query_dense: Optional[np.ndarray], mode: str, k: int,
+               dense_weight: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (chunk indices, scores) of the k best chunks across shards, best first"""
+        if len(self.shards) == 1:
+            results = [self.shards[0].top_k(query_vector, query_dense, mode, k, dense_weight)]
+        else:
+            pool = get_shard_pool()
+            futures = [pool.submit(shard.top_k, query_vector, query_dense, mode, k, dense_weight) for shard in self.shards]
+            results = [future.result() for future in futures]
+        best = heapq.nlargest(k, itertools.chain.from_iterable(results))
+        ids = np.array([index for _, index in best], dtype=np.int64)
+        scores = np.array([score for score, _ in best], dtype=np.float64)
+        return ids, scores
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key.
+
+    The first caller for a key starts the computation; callers arriving while
+    it runs await the same task instead of starting their own, and all of them
+    get its result (or its exception). The key is forgotten as soon as the task
+    finishes, so this coalesces only requests that overlap; it is not a cache.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared); shared is True if another caller's computation was reused"""
+        task = self.calls.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(compute())
+            self.calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # A caller that disconnects must not cancel the computation the others are waiting on
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller has gone away
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
@@ -1,89 +1,60 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
-import os
-import pandas as pd
-import json
-import io
-from app.rag import add_documents, get_documents_list, delete_document, clear_knowledge_base
+from starlette.concurrency import run_in_threadpool
+from functools import partial
+from datetime import datetime
+from typing import List, Optional
+from app.rag import (
+    add_documents, add_document_batch, find_document_by_hash, get_documents_list, delete_document,
+    clear_knowledge_base, resolve_namespace
+)
+from app.ingest_jobs import spool_upload, submit_ingestion_job, get_job
+from app.extraction import extract_files
+from app.document_processor import chunk_stream
 
 upload_router = APIRouter()
 
-def extract_text_from_file(file: UploadFile) -> List[str]:
-    """Extract text content from uploaded file based on file type"""
-    ext = os.path.splitext(file.filename)[1].lower()
-    contents = file.file.read()
-
-    if ext == ".txt":
-        text = contents.decode("utf-8")
-        return [line.strip() for line in text.split("\n") if line.strip()]
-    elif ext == ".csv":
-        # Reset file pointer for pandas
-        file.file.seek(0)
-        df = pd.read_csv(file.file)
-        return [row.to_json() for _, row in df.iterrows()]
-    elif ext == ".json":
-        data = json.loads(contents.decode("utf-8"))
-        if isinstance(data, list):
-            return [json.dumps(entry) for entry in data]
-        elif isinstance(data, dict):
-            return [json.dumps(data)]
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported JSON format.")
-    elif ext == ".pdf":
-        try:
-            from PyPDF2 import PdfReader
-            reader = PdfReader(io.BytesIO(contents))
-            text_chunks = []
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_chunks.extend([line.strip() for line in text.split("\n") if line.strip()])
-            return text_chunks
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"PDF parsing error: {str(e)}")
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file type.")
+def validate_namespace(namespace: Optional[str]) -> str:
+    """Resolve the knowledge base namespace (user or team id) of a request, defaulting to the shared one"""
+    try:
+        return resolve_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@upload_router.post("/upload_docs")
-async def upload_documents(files: List[UploadFile] = File(...)):
-    """Upload and process multiple documents into the knowledge base"""
-    all_chunks = []
-    failed_files = []
-    processed_files = []
-    
+@upload_router.post("/upload_docs", status_code=202)
+async def upload_documents(files: List[UploadFile] = File(...), namespace: Optional[str] = None):
+    """Queue uploaded documents for background processing into the knowledge base"""
+    namespace = validate_namespace(namespace)
+    spooled = []
     for file in files:
-        try:
-            chunks = extract_text_from_file(file)
-            # Get file size
-            file.file.seek(0, 2)  # Seek to end
-            file_size = file.file.tell()
-            file.file.seek(0)  # Reset to beginning
-            
-            # Add documents with metadata
-            add_documents(chunks, filename=file.filename, file_size=file_size)
-            processed_files.append({
-                "filename": file.filename,
-                "chunks": len(chunks),
-                "size": file_size
-            })
-            all_chunks.extend(chunks)
-        except Exception as e:
-            failed_files.append(f"{file.filename}: {str(e)}")
+        # Copy each upload to disk off the event loop; processing happens in the job
+        path, file_size, content_hash = await run_in_threadpool(spool_upload, file)
+        spooled.append((file.filename, path, file_size, content_hash))
+    
+    job = submit_ingestion_job(
+        spooled, extract_files,
+        partial(add_document_batch, namespace=namespace),
+        partial(find_document_by_hash, namespace=namespace)
+    )
+    return {
+        "message": f"Queued {len(spooled)} files for processing",
+        "namespace": namespace,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/chat/upload_jobs/{job.id}"
+    }
 
-    if processed_files:
-        return {
-            "message": f"Successfully processed {len(processed_files)} files",
-            "files_processed": len(processed_files),
-            "chunks_added": len(all_chunks),
-            "failed_files": failed_files,
-            "processed_files": processed_files
-        }
-    else:
-        raise HTTPException(status_code=400, detail="No valid text extracted from files.")
+@upload_router.get("/upload_jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Report per-file progress, chunk counts and errors for an upload job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
 
 @upload_router.post("/add-documents")
-async def add_text_documents(documents: dict):
+async def add_text_documents(documents: dict, namespace: Optional[str] = None):
     """Add text documents directly via JSON payload"""
+    namespace = validate_namespace(namespace)
     if "documents" not in documents:
         raise HTTPException(status_code=400, detail="Missing 'documents' field")
     
@@ -91,20 +62,31 @@ async def add_text_documents(documents: dict):
     if not isinstance(docs, list):
         raise HTTPException(status_code=400, detail="Documents must be a list")
     
-    add_documents(docs, filename="manual_input.json")
+    # Long documents are split by the same sentence-aware chunker as uploaded files
+    chunks = [chunk for doc in docs for chunk in chunk_stream(str(doc).split("\n"))]
+    add_documents(chunks, filename="manual_input.json", namespace=namespace)
     return {"message": f"Added {len(docs)} documents to knowledge base"}
 
 @upload_router.get("/documents")
-async def list_documents():
-    """Get list of all uploaded documents"""
-    documents = get_documents_list()
-    return {"documents": documents}
+async def list_documents(namespace: Optional[str] = None, filename: Optional[str] = None,
+                         uploaded_after: Optional[datetime] = None, uploaded_before: Optional[datetime] = None,
+                         offset: int = 0, limit: Optional[int] = None):
+    """List uploaded documents, optionally filtered by filename substring and upload date, a page at a time"""
+    namespace = validate_namespace(namespace)
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    
+    total, documents = get_documents_list(namespace, filename, uploaded_after, uploaded_before, offset, limit)
+    return {"documents": documents, "total": total, "offset": offset, "limit": limit}
 
 @upload_router.delete("/documents/{document_id}")
-async def delete_document_endpoint(document_id: int):
+async def delete_document_endpoint(document_id: int, namespace: Optional[str] = None):
     """Delete a specific document from the knowledge base"""
+    namespace = validate_namespace(namespace)
     try:
-        result = delete_document(document_id)
+        result = delete_document(document_id, namespace)
         return result
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -112,10 +94,11 @@ async def delete_document_endpoint(document_id: int):
         raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
 
 @upload_router.delete("/documents")
-async def clear_all_documents():
+async def clear_all_documents(namespace: Optional[str] = None):
     """Clear all documents from the knowledge base"""
+    namespace = validate_namespace(namespace)
     try:
-        result = clear_knowledge_base()
+        result = clear_knowledge_base(namespace)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing knowledge base: {str(e)}") 
\ No newline at end of file
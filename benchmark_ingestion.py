@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for CSV ingestion (rows/second).
+
+Compares the per-row iterrows() builders with the vectorized, chunked
+versions used by ingest_knowledge_base.py and /chat/upload_docs.
+
+Usage: python benchmark_ingestion.py [rows]
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+
+from ingest_knowledge_base import format_row, format_rows, CHUNK_ROWS
+from app.extraction import csv_to_json_chunks
+
+CSV_PATH = "data/HackathonInternalKnowledgeBase.csv"
+# The per-row baselines are slow; time them on a sample and extrapolate the rate
+BASELINE_SAMPLE_ROWS = 20000
+
+def build_dataset(rows: int) -> pd.DataFrame:
+    """Repeat the knowledge base CSV until it has the requested number of rows"""
+    base = pd.read_csv(CSV_PATH)
+    repeats = -(-rows // len(base))
+    return pd.concat([base] * repeats, ignore_index=True).head(rows)
+
+def measure(label: str, rows: int, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"  {label:<48} {rows:>9,} rows  {elapsed:8.3f}s  {rate:>12,.0f} rows/s")
+    return rate
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"Building a {rows:,} row dataset from {CSV_PATH}...")
+    df = build_dataset(rows)
+    sample = df.head(BASELINE_SAMPLE_ROWS)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        df.to_csv(f, index=False)
+        csv_file = f.name
+
+    try:
+        print("\nText chunks (ingest_knowledge_base.py)")
+        slow = measure("iterrows + format_row", len(sample), lambda: [format_row(r) for _, r in sample.iterrows()])
+        fast = measure("format_rows (vectorized)", rows, lambda: format_rows(df))
+        measure(f"chunked read_csv + format_rows ({CHUNK_ROWS:,}/chunk)", rows,
+                lambda: [c for chunk in pd.read_csv(csv_file, chunksize=CHUNK_ROWS) for c in format_rows(chunk)])
+        print(f"  speedup: {fast / slow:.1f}x")
+
+        print("\nJSON chunks (/chat/upload_docs .csv)")
+        slow = measure("iterrows + row.to_json", len(sample), lambda: [r.to_json() for _, r in sample.iterrows()])
+        with open(csv_file, "rb") as f:
+            content = f.read()
+        fast = measure("csv_to_json_chunks (chunked)", rows, lambda: csv_to_json_chunks(io.BytesIO(content)))
+        print(f"  speedup: {fast / slow:.1f}x")
+    finally:
+        os.remove(csv_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Recall@k vs latency benchmark for the IVF index used by dense retrieval.
+
+Builds an app.ann.IVFIndex over synthetic clustered unit vectors (shaped like
+the LSA chunk vectors in app/rag.py) and compares it with brute-force scoring
+for a range of nprobe values.
+
+Usage: python benchmark_retrieval.py [vectors] [--dims 128] [--queries 200] [--k 10] [--pq 16]
+"""
+
+import argparse
+import time
+import numpy as np
+
+from app.ann import IVFIndex, default_nlist
+
+NPROBE_VALUES = [1, 2, 4, 8, 16, 32, 64]
+
+def make_vectors(n: int, dims: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around random topic directions"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((clusters, dims)).astype(np.float32)
+    vectors = topics[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors)
+
+def brute_force(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("vectors", type=int, nargs="?", default=200000)
+    parser.add_argument("--dims", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="coarse clusters (0 = ~4*sqrt(n))")
+    parser.add_argument("--pq", type=int, default=0, help="PQ subvectors (0 = exact scoring of candidates)")
+    args = parser.parse_args()
+
+    print(f"Generating {args.vectors:,} x {args.dims} vectors...")
+    vectors = make_vectors(args.vectors, args.dims, clusters=max(10, args.vectors // 500))
+    queries = make_vectors(args.queries, args.dims, clusters=max(10, args.vectors // 500), seed=1)
+
+    start = time.perf_counter()
+    truth = [brute_force(vectors, q, args.k) for q in queries]
+    brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    nlist = args.nlist or default_nlist(len(vectors))
+    start = time.perf_counter()
+    index = IVFIndex(nlist=nlist, pq_subvectors=args.pq).build(vectors)
+    build_s = time.perf_counter() - start
+    print(f"Built IVF index: {nlist} lists{f', PQ {args.pq} subvectors' if args.pq else ''} in {build_s:.1f}s\n")
+
+    print(f"  {'method':<16} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>9}")
+    print(f"  {'brute force':<16} {1.0:>10.3f} {brute_ms:>10.3f} {1.0:>8.1f}x")
+    for nprobe in NPROBE_VALUES:
+        if nprobe > nlist:
+            break
+        start = time.perf_counter()
+        results = [index.search(q, args.k, vectors, nprobe=nprobe)[0] for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(np.intersect1d(found, expected)) / args.k for found, expected in zip(results, truth)])
+        print(f"  {'nprobe=' + str(nprobe):<16} {recall:>10.3f} {ivf_ms:>10.3f} {brute_ms / ivf_ms:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,15 @@ import pandas as pd
 import random
 import sys
 import os
+from typing import Iterator, List
 
 # Add the app directory to the path so we can import rag
 sys.path.append('app')
 from rag import add_documents, get_knowledge_base_stats
 
+# Rows parsed per read_csv chunk; bounds memory regardless of file size
+CHUNK_ROWS = 50000
+
 def format_row(row):
     """Convert each row into a descriptive text chunk for the RAG knowledge base"""
     return (
@@ -19,6 +23,24 @@ def format_row(row):
         f"with support from {row['Associate 2']}, {row['Associate 3']}, and {row['Associate 4']}."
     )
 
+def format_rows(df: pd.DataFrame) -> List[str]:
+    """Vectorized format_row: build every chunk with column-wise string concatenation"""
+    def col(name):
+        # str() per value so missing cells render as "nan", exactly like the f-string in
+        # format_row; astype(str) leaves them NaN for pandas string columns
+        return df[name].map(str)
+    
+    text = (
+        "Suite " + col('Suite') + " at " + col('Property Address') + " (Floor " + col('Floor') + ") "
+        + "offers " + col('Size (SF)') + " SF at " + col('Rent/SF/Year') + " per year. "
+        + "Monthly rent is " + col('Monthly Rent') + ". "
+        + "Annual rent is " + col('Annual Rent') + ". "
+        + "GCI on 3 years is " + col('GCI On 3 Years') + ". "
+        + "Handled by " + col('Associate 1') + " (Email: " + col('BROKER Email ID') + "), "
+        + "with support from " + col('Associate 2') + ", " + col('Associate 3') + ", and " + col('Associate 4') + "."
+    )
+    return text.tolist()
+
 def main():
     print("Loading CSV data...")
     
@@ -29,54 +51,50 @@ def main():
         print(f"Error: CSV file not found at {csv_path}")
         return
     
-    try:
-        df = pd.read_csv(csv_path)
-        print(f"Successfully loaded {len(df)} rows from CSV")
-    except Exception as e:
-        print(f"Error loading CSV: {e}")
-        return
-    
     # Get initial knowledge base stats
     initial_stats = get_knowledge_base_stats()
     print(f"Initial knowledge base stats: {initial_stats}")
     
-    # Generate formatted knowledge chunks
-    print("Formatting data into knowledge chunks...")
-    knowledge_chunks = []
-    
-    for _, row in df.iterrows():
-        try:
-            formatted_chunk = format_row(row)
-            knowledge_chunks.append(formatted_chunk)
-        except Exception as e:
-            print(f"Error formatting row {row.get('unique_id', 'unknown')}: {e}")
-            continue
+    # Stream the CSV in chunks straight into the knowledge base; only one chunk of rows
+    # (plus a few preview samples) is held at a time
+    print("Formatting and ingesting knowledge chunks...")
+    counts = {"rows": 0}
+    sample_preview: List[str] = []
     
-    print(f"Successfully formatted {len(knowledge_chunks)} knowledge chunks")
+    def iter_knowledge_chunks() -> Iterator[str]:
+        for chunk_number, df in enumerate(pd.read_csv(csv_path, chunksize=CHUNK_ROWS), 1):
+            try:
+                texts = format_rows(df)
+            except Exception as e:
+                print(f"Error formatting CSV chunk {chunk_number}: {e}")
+                continue
+            for text in texts:
+                counts["rows"] += 1
+                # Reservoir sample of three chunks for the preview
+                if len(sample_preview) < 3:
+                    sample_preview.append(text)
+                else:
+                    slot = random.randrange(counts["rows"])
+                    if slot < 3:
+                        sample_preview[slot] = text
+                yield text
     
-    # Preview a few sample chunks
-    print("\nSample knowledge chunks:")
-    sample_preview = random.sample(knowledge_chunks, min(3, len(knowledge_chunks)))
-    for i, chunk in enumerate(sample_preview, 1):
-        print(f"\nSample {i}:")
-        print(chunk)
-    
-    # Ingest the chunks into the RAG system with metadata
-    print(f"\nIngesting {len(knowledge_chunks)} chunks into RAG system...")
     try:
-        # Calculate approximate file size based on text content
-        total_text = '\n'.join(knowledge_chunks)
-        file_size = len(total_text.encode('utf-8'))
-        
         add_documents(
-            knowledge_chunks, 
+            iter_knowledge_chunks(),
             filename="HackathonInternalKnowledgeBase.csv",
-            file_size=file_size
+            file_size=os.path.getsize(csv_path)
         )
-        print("Successfully ingested all chunks into RAG system!")
     except Exception as e:
         print(f"Error ingesting chunks: {e}")
         return
+    print(f"Successfully ingested {counts['rows']} knowledge chunks into RAG system!")
+    
+    # Preview a few sample chunks
+    print("\nSample knowledge chunks:")
+    for i, chunk in enumerate(sample_preview, 1):
+        print(f"\nSample {i}:")
+        print(chunk)
     
     # Get final knowledge base stats
     final_stats = get_knowledge_base_stats()
@@ -625,9 +625,18 @@ async function handleFileUpload(event) {
         });
         
         if (response.ok) {
-            const data = await response.json();
+            const { job_id } = await response.json();
+            const data = await waitForUploadJob(job_id);
             hideUploadProgress();
-            showNotification(`Successfully uploaded ${data.files_processed} files and added ${data.chunks_added} text chunks to the knowledge base.`, 'success');
+            if (data.files_processed > 0) {
+                showNotification(`Successfully uploaded ${data.files_processed} files and added ${data.chunks_added} text chunks to the knowledge base.`, 'success');
+            }
+            if (data.files_duplicate > 0) {
+                showNotification(`${data.files_duplicate} files were already in the knowledge base and were skipped.`, 'info');
+            }
+            if (data.files_failed > 0) {
+                showNotification(`Failed to process: ${data.failed_files.join(', ')}`, 'error');
+            }
             loadKnowledgeBaseStats();
         } else {
             throw new Error('Upload failed');
@@ -642,6 +651,21 @@ async function handleFileUpload(event) {
     event.target.value = '';
 }
 
+// Uploads are processed in the background; poll the job until it finishes
+async function waitForUploadJob(jobId) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/chat/upload_jobs/${jobId}`);
+        if (!response.ok) {
+            throw new Error('Upload job lookup failed');
+        }
+        const job = await response.json();
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 function showUploadProgress() {
     const uploadArea = document.getElementById('uploadArea');
     const progressContainer = document.getElementById('uploadProgress');
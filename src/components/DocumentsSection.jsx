@@ -3,10 +3,13 @@ import { Upload, FileText, Database, Search, Brain, ArrowUp, CheckCircle, Trash2
 import { useNotification } from '../contexts/NotificationContext';
 import { chatAPI } from '../services/api';
 
+const UPLOAD_POLL_INTERVAL_MS = 1000;
+
 const DocumentsSection = () => {
   const { addNotification } = useNotification();
   const [uploading, setUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
+  const [uploadStatus, setUploadStatus] = useState('');
   const [dragOver, setDragOver] = useState(false);
   const [documents, setDocuments] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -47,43 +50,66 @@ const DocumentsSection = () => {
     }
   };
 
+  // Poll the background ingestion job until every file is processed
+  const waitForUploadJob = async (jobId) => {
+    while (true) {
+      const job = await chatAPI.getUploadJob(jobId);
+      const done = job.files_processed + job.files_failed + job.files_duplicate;
+      setUploadProgress(30 + (70 * done) / Math.max(job.files_total, 1));
+
+      const current = job.files.find(file => file.status === 'processing');
+      setUploadStatus(current
+        ? `Processing ${current.filename}...`
+        : `Processed ${done} of ${job.files_total} files`);
+
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+      await new Promise(resolve => setTimeout(resolve, UPLOAD_POLL_INTERVAL_MS));
+    }
+  };
+
   const handleFileUpload = async (files) => {
     if (!files || files.length === 0) return;
 
     setUploading(true);
     setUploadProgress(0);
-
-    // Simulate progress
-    const progressInterval = setInterval(() => {
-      setUploadProgress(prev => {
-        if (prev >= 90) return prev;
-        return prev + Math.random() * 15;
-      });
-    }, 200);
+    setUploadStatus('Uploading files...');
 
     try {
-      const response = await chatAPI.uploadDocuments(Array.from(files));
-      
-      clearInterval(progressInterval);
+      const { job_id: jobId } = await chatAPI.uploadDocuments(Array.from(files));
+      setUploadProgress(30);
+
+      const job = await waitForUploadJob(jobId);
       setUploadProgress(100);
-      
+      setUploadStatus('Upload complete!');
+
       setTimeout(() => {
         setUploading(false);
         setUploadProgress(0);
+        setUploadStatus('');
       }, 1500);
 
-      addNotification(
-        `Successfully uploaded ${response.files_processed} files and added ${response.chunks_added} text chunks to the knowledge base.`,
-        'success'
-      );
+      if (job.files_processed > 0) {
+        addNotification(
+          `Successfully uploaded ${job.files_processed} files and added ${job.chunks_added} text chunks to the knowledge base.`,
+          'success'
+        );
+      }
+      if (job.files_duplicate > 0) {
+        addNotification(`${job.files_duplicate} files were already in the knowledge base and were skipped.`, 'info');
+      }
+      if (job.files_failed > 0) {
+        addNotification(`Failed to process: ${job.failed_files.join(', ')}`, 'error');
+      }
 
       // Reload documents to update the list
       loadDocuments();
 
     } catch (error) {
-      clearInterval(progressInterval);
       setUploading(false);
       setUploadProgress(0);
+      setUploadStatus('');
       addNotification('Upload failed. Please check your files and try again.', 'error');
     }
   };
@@ -268,7 +294,7 @@ const DocumentsSection = () => {
                     ref={fileInputRef}
                     type="file"
                     multiple
-                    accept=".pdf,.csv,.json,.txt"
+                    accept=".pdf,.docx,.csv,.json,.jsonl,.txt"
                     onChange={handleFileInputChange}
                     className="hidden"
                   />
@@ -286,10 +312,7 @@ const DocumentsSection = () => {
                     />
                   </div>
                   <div className="text-sm text-gray-600">
-                    {uploadProgress < 30 ? 'Uploading files...' :
-                     uploadProgress < 60 ? 'Extracting text content...' :
-                     uploadProgress < 90 ? 'Processing and indexing...' :
-                     'Upload complete!'}
+                    {uploadStatus}
                   </div>
                 </div>
               )}
@@ -34,14 +34,20 @@ export const chatAPI = {
     return response.data;
   },
 
+  getUploadJob: async (jobId) => {
+    const response = await api.get(`/chat/upload_jobs/${jobId}`);
+    return response.data;
+  },
+
   addDocuments: async (documents) => {
     const response = await api.post('/chat/add-documents', { documents });
     return response.data;
   },
 
   // Document Management
-  getDocuments: async () => {
-    const response = await api.get('/chat/documents');
+  // params: { filename, uploaded_after, uploaded_before, offset, limit }
+  getDocuments: async (params = {}) => {
+    const response = await api.get('/chat/documents', { params });
     return response.data;
   },
 
@@ -52,6 +52,47 @@ def test_portfolio_stats():
         print(f"❌ Error: {e}")
         return False
 
+def test_portfolio_aggregate():
+    """Test group-by aggregation endpoint"""
+    
+    print("\n🧮 Testing Portfolio Aggregation")
+    print("=" * 60)
+    
+    payload = {
+        "group_by": ["Associate 1"],
+        "metrics": {"GCI On 3 Years": ["sum", "mean", "p90"]},
+        "sort_by": "GCI On 3 Years_sum",
+        "limit": 5
+    }
+    
+    try:
+        response = requests.post(f"{BASE_URL}/analyze/aggregate", json=payload)
+        
+        if response.status_code == 200:
+            data = response.json()
+            
+            print(f"✅ Aggregation returned {data['total_groups']} groups (dataset v{data['dataset_version']})")
+            for group in data['groups']:
+                print(f"   {group['Associate 1']}: ${group['GCI On 3 Years_sum']:,.0f} total GCI")
+            
+            # Same request again should be served from the cache
+            repeat = requests.post(f"{BASE_URL}/analyze/aggregate", json=payload).json()
+            if repeat.get('cached'):
+                print("✅ Repeated aggregation served from cache")
+                return True
+            
+            print("❌ Repeated aggregation was not cached")
+            return False
+            
+        else:
+            print(f"❌ Aggregate request failed with status: {response.status_code}")
+            print(f"   Response: {response.text}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
 def test_portfolio_analyzer():
     """Test the natural language portfolio analyzer"""
     
@@ -286,6 +327,36 @@ def test_csv_export():
         print(f"❌ CSV export error: {e}")
         return False
 
+def test_streaming_export():
+    """Test streaming CSV export"""
+    print("\n📤 Testing Streaming Export")
+    print("=" * 60)
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/analyze/export",
+            json={
+                "user_id": "test_user_export",
+                "filters": {"Size (SF)": {"gt": 15000}},
+                "format": "csv"
+            },
+            stream=True,
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            lines = [line for line in response.iter_lines() if line]
+            print(f"✅ Streaming export successful!")
+            print(f"   Rows exported: {len(lines) - 1}")
+            return len(lines) > 1
+        else:
+            print(f"❌ Streaming export failed: {response.status_code}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Streaming export error: {e}")
+        return False
+
 def test_combined_chart_and_csv():
     """Test both chart and CSV generation together"""
     print("\n🔄 Testing Combined Chart & CSV Generation")
@@ -351,6 +422,9 @@ def main():
     # Test portfolio statistics
     results.append(test_portfolio_stats())
     
+    # Test group-by aggregation
+    results.append(test_portfolio_aggregate())
+    
     # Test portfolio analyzer
     results.append(test_portfolio_analyzer())
     
@@ -363,6 +437,7 @@ def main():
     # Test new visualization features
     results.append(test_chart_generation())
     results.append(test_csv_export())
+    results.append(test_streaming_export())
     results.append(test_combined_chart_and_csv())
     
     # Summary
@@ -373,11 +448,13 @@ def main():
     test_names = [
         "Server Health",
         "Portfolio Statistics",
+        "Portfolio Aggregation",
         "Portfolio Analyzer",
         "Specific Scenarios",
         "API Documentation",
         "Chart Generation",
         "CSV Export",
+        "Streaming Export",
         "Combined Chart & CSV"
     ]
     
@@ -0,0 +1,50 @@
+import io
+import json
+import pytest
+
+from app.extraction import iter_json_values
+
+def parse(data: bytes, read_bytes: int = 64 * 1024):
+    return [json.loads(value) for value in iter_json_values(io.BytesIO(data), read_bytes)]
+
+def test_json_array():
+    """Elements of a top-level array are yielded one by one"""
+    assert parse(b'[{"a": 1}, {"b": [2, 3]}, 4, "five"]') == [{"a": 1}, {"b": [2, 3]}, 4, "five"]
+    assert parse(b' [ ] ') == []
+
+def test_json_object():
+    """A single top-level object is one value"""
+    assert parse(b'{"name": "Suite 100", "rent": 87.5}') == [{"name": "Suite 100", "rent": 87.5}]
+
+def test_json_lines():
+    """Whitespace-separated objects (JSON-lines) are yielded in order"""
+    assert parse(b'{"a": 1}\n{"b": 2}\n\n{"c": 3}\n') == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+@pytest.mark.parametrize("data", [
+    b'[{"a": 1}, {"b": 2}',   # unterminated array
+    b'{"a": 1',               # truncated object
+    b'[1, 2] 3',              # data after the array
+    b'[1,,,2]',               # doubled commas
+    b'[,1]',                  # leading comma
+    b'[1, 2,]',               # trailing comma
+    b'[1 2]',                 # missing comma
+    b'{"a": 1}, {"b": 2}',    # commas between JSON-lines objects
+    b'"just a string"',       # top-level scalar
+])
+def test_malformed_json_is_rejected(data):
+    with pytest.raises(ValueError):
+        parse(data)
+
+def test_values_split_across_reads():
+    """Values spanning many read blocks (including multi-byte characters) parse like json.loads"""
+    records = [{"id": i, "text": "café " * (i % 7), "values": list(range(i % 5))} for i in range(200)]
+    data = json.dumps(records, ensure_ascii=False).encode("utf-8")
+    for read_bytes in (1, 7, 64, 1000):
+        assert parse(data, read_bytes) == records
+
+    # One value far larger than a read block
+    big = {"rows": [{"k": "v" * 50, "i": i} for i in range(2000)]}
+    assert parse(json.dumps(big).encode("utf-8"), read_bytes=16) == [big]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from ingest_knowledge_base import format_row, format_rows
+
+CSV_PATH = "data/HackathonInternalKnowledgeBase.csv"
+
+@pytest.fixture
+def df():
+    df = pd.read_csv(CSV_PATH, nrows=20)
+    # Empty cells of every kind: missing strings, missing numbers, None
+    df.loc[1, "Associate 4"] = None
+    df.loc[2, "Associate 2"] = float("nan")
+    df.loc[3, "Floor"] = None
+    df.loc[4, "Monthly Rent"] = None
+    return df
+
+def test_format_rows_matches_format_row(df):
+    """The vectorized formatter gives the same text as formatting row by row"""
+    expected = [format_row(row) for _, row in df.iterrows()]
+    assert format_rows(df) == expected
+    assert all(isinstance(text, str) for text in format_rows(df))
+    assert "and nan." in expected[1]
+
+def test_missing_cells_from_csv(tmp_path):
+    """Empty cells in the file itself render as "nan" rather than breaking the chunk"""
+    path = tmp_path / "kb.csv"
+    df = pd.read_csv(CSV_PATH, nrows=3)
+    df.loc[0, "Associate 4"] = None
+    df.loc[2, "BROKER Email ID"] = None
+    df.to_csv(path, index=False)
+
+    reloaded = pd.read_csv(path)
+    assert format_rows(reloaded) == [format_row(row) for _, row in reloaded.iterrows()]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,99 @@
+import threading
+import numpy as np
+import pytest
+
+from app.rag import KnowledgeBase, chunk_hash
+
+SHARED = "Suite 100 at 1 Times Square rents for 90 dollars per square foot"
+FIRST_ONLY = "Suite 200 on Broadway is handled by Jack Sparrow"
+SECOND_ONLY = "Suite 300 on 5th Avenue has a monthly rent of 150000"
+
+@pytest.fixture
+def kb(tmp_path):
+    kb = KnowledgeBase("test", str(tmp_path))
+    kb.add_document_batch([
+        ([SHARED, FIRST_ONLY], "first.txt", 100, "hash-first"),
+        ([SECOND_ONLY, SHARED], "second.txt", 100, "hash-second"),
+    ])
+    return kb
+
+def refcount(kb, text):
+    return kb.chunk_refcounts[kb.chunk_hash_index[chunk_hash(text)]]
+
+def document_id(kb, filename):
+    return next(doc.id for doc in kb.documents if doc.filename == filename)
+
+def test_shared_chunk_is_stored_once(kb):
+    """A chunk two documents contain is stored once and referenced by both"""
+    assert list(kb.document_chunks) == [SHARED, FIRST_ONLY, SECOND_ONLY]
+    assert refcount(kb, SHARED) == 2
+    assert refcount(kb, FIRST_ONLY) == 1
+    assert refcount(kb, SECOND_ONLY) == 1
+
+@pytest.mark.parametrize("deleted, kept_text, gone_text", [
+    ("first.txt", SECOND_ONLY, FIRST_ONLY),
+    ("second.txt", FIRST_ONLY, SECOND_ONLY),
+])
+def test_delete_keeps_chunks_still_referenced(kb, deleted, kept_text, gone_text):
+    """Deleting either document releases its references; the shared chunk survives"""
+    kb.delete_document(document_id(kb, deleted))
+    assert sorted(kb.document_chunks) == sorted([SHARED, kept_text])
+    assert refcount(kb, SHARED) == 1
+    assert refcount(kb, kept_text) == 1
+    assert chunk_hash(gone_text) not in kb.chunk_hash_index
+
+    assert kb.query("Times Square", top_k=1) == [SHARED]
+    assert gone_text not in kb.query(gone_text, top_k=3)
+    assert kb.query(kept_text, top_k=1) == [kept_text]
+
+def test_deleting_both_documents_removes_shared_chunk(kb):
+    kb.delete_document(document_id(kb, "first.txt"))
+    kb.delete_document(document_id(kb, "second.txt"))
+    assert list(kb.document_chunks) == []
+    assert list(kb.chunk_refcounts) == []
+    assert kb.query("Times Square") == []
+
+def test_published_index_is_a_snapshot(kb):
+    """An index a query already holds is unaffected by later uploads and deletes"""
+    index = kb.index
+    ids, scores = index.rank_chunks("Times Square rent", 3)
+    texts = [index.chunks[i] for i in ids]
+
+    kb.add_document_batch([(["Suite 400 near Times Square has new renovated lobby"], "third.txt", 50, "hash-third")])
+    kb.delete_document(document_id(kb, "first.txt"))
+    assert kb.index is not index
+    assert kb.index.generation != index.generation
+
+    again_ids, again_scores = index.rank_chunks("Times Square rent", 3)
+    assert again_ids.tolist() == ids.tolist() and np.allclose(again_scores, scores)
+    assert [index.chunks[i] for i in again_ids] == texts
+    assert [index.chunk_hashes[i] for i in again_ids] == [chunk_hash(text) for text in texts]
+
+def test_queries_during_refits(kb):
+    """Queries racing background uploads and deletes always see a consistent index"""
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        try:
+            for i in range(15):
+                kb.add_document_batch([([f"Suite {500 + i} floor {i} word{i} office"], f"w{i}.txt", 10, f"hash-w{i}")])
+                kb.delete_document(document_id(kb, f"w{i}.txt"))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        index = kb.index
+        ids, _ = index.rank_chunks("suite office floor", 5)
+        assert all(0 <= i < index.size for i in ids)
+        generation, hashes, texts = kb.query_with_ids("Times Square")
+        assert hashes == [chunk_hash(text) for text in texts]
+    thread.join()
+    assert errors == []
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,88 @@
+import threading
+import openai
+import pytest
+
+from app import llm_gateway as gateway_module
+from app.llm_gateway import LLMGateway, LLMOverloaded
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gateway_module, "backoff_delay", lambda attempt, error=None: 0.0)
+
+def flaky(failures: int, error=lambda: openai.APIConnectionError(request=None)):
+    """A request that raises error() for its first failures calls, then answers"""
+    calls = []
+
+    def request(value):
+        calls.append(value)
+        if len(calls) <= failures:
+            raise error()
+        return value
+    return request, calls
+
+def test_rejects_when_all_slots_stay_busy():
+    """A call that can't get a concurrency slot within the queue timeout raises LLMOverloaded"""
+    gateway = LLMGateway(max_concurrency=1, rate=0, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "slow"
+
+    holder = threading.Thread(target=gateway.call, args=(slow,))
+    holder.start()
+    started.wait(5)
+    try:
+        with pytest.raises(LLMOverloaded) as excinfo:
+            gateway.call(lambda: "fast")
+    finally:
+        release.set()
+        holder.join()
+    assert excinfo.value.retry_after >= 1
+    stats = gateway.stats()
+    assert stats["rejected"] == 1
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+def test_rejects_beyond_rate_limit():
+    """Once the burst is spent, a call that would wait past the queue timeout for a token is rejected"""
+    gateway = LLMGateway(max_concurrency=4, rate=1, burst=1, queue_timeout=0.05)
+    assert gateway.call(lambda: "first") == "first"
+    with pytest.raises(LLMOverloaded):
+        gateway.call(lambda: "second")
+    assert gateway.stats()["rejected"] == 1
+
+def test_retries_transient_errors():
+    gateway = LLMGateway(rate=0, max_retries=3)
+    request, calls = flaky(2)
+    assert gateway.call(request, "answer") == "answer"
+    assert len(calls) == 3
+    stats = gateway.stats()
+    assert stats["retries"] == 2 and stats["failures"] == 0 and stats["calls"] == 1
+
+@pytest.mark.parametrize("error", [
+    lambda: openai.APIConnectionError(request=None),
+    lambda: openai.APITimeoutError(request=None),
+])
+def test_sheds_load_after_max_retries(error):
+    """Transient errors that outlast the retries become LLMOverloaded (a 503 with Retry-After)"""
+    gateway = LLMGateway(rate=0, max_retries=2)
+    request, calls = flaky(10, error)
+    with pytest.raises(LLMOverloaded) as excinfo:
+        gateway.call(request, "answer")
+    assert excinfo.value.retry_after >= 1
+    assert isinstance(excinfo.value.__cause__, openai.APIConnectionError)
+    assert len(calls) == 3
+    stats = gateway.stats()
+    assert stats["retries"] == 2 and stats["failures"] == 1 and stats["rejected"] == 0
+
+def test_does_not_retry_other_errors():
+    gateway = LLMGateway(rate=0, max_retries=3)
+    request, calls = flaky(1, error=lambda: ValueError("bad request"))
+    with pytest.raises(ValueError):
+        gateway.call(request, "answer")
+    assert len(calls) == 1
+    assert gateway.stats()["retries"] == 0
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -111,6 +111,16 @@ class ProjectTester:
             self.log_test("Conversation History", False, f"Error: {str(e)}")
             return False
             
+    def wait_for_upload_job(self, job_id, timeout=60):
+        """Poll a background upload job until it finishes"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.session.get(f"{self.base_url}/chat/upload_jobs/{job_id}").json()
+            if job.get("status") in ("completed", "failed"):
+                return job
+            time.sleep(0.5)
+        raise TimeoutError(f"Upload job {job_id} did not finish in {timeout}s")
+        
     def create_test_files(self):
         """Create test files for upload testing"""
         test_dir = Path("test_files")
@@ -150,10 +160,10 @@ Office C,2000,4000,Yes"""
                 files = {'files': (txt_file.name, f, 'text/plain')}
                 response = self.session.post(f"{self.base_url}/chat/upload_docs", files=files)
                 
-            success = response.status_code == 200
+            success = response.status_code == 202
             if success:
-                data = response.json()
-                has_message = "message" in data and "chunks_added" in data
+                data = self.wait_for_upload_job(response.json()["job_id"])
+                has_message = data["status"] == "completed" and "chunks_added" in data
                 success = has_message
                 self.log_test("TXT File Upload", success, f"Added {data.get('chunks_added', 0)} chunks")
             else:
@@ -173,10 +183,10 @@ Office C,2000,4000,Yes"""
                 files = {'files': (csv_file.name, f, 'text/csv')}
                 response = self.session.post(f"{self.base_url}/chat/upload_docs", files=files)
                 
-            success = response.status_code == 200
+            success = response.status_code == 202
             if success:
-                data = response.json()
-                has_message = "message" in data and "chunks_added" in data
+                data = self.wait_for_upload_job(response.json()["job_id"])
+                has_message = data["status"] == "completed" and "chunks_added" in data
                 success = has_message
                 self.log_test("CSV File Upload", success, f"Added {data.get('chunks_added', 0)} chunks")
             else:
@@ -196,10 +206,10 @@ Office C,2000,4000,Yes"""
                 files = {'files': (json_file.name, f, 'application/json')}
                 response = self.session.post(f"{self.base_url}/chat/upload_docs", files=files)
                 
-            success = response.status_code == 200
+            success = response.status_code == 202
             if success:
-                data = response.json()
-                has_message = "message" in data and "chunks_added" in data
+                data = self.wait_for_upload_job(response.json()["job_id"])
+                has_message = data["status"] == "completed" and "chunks_added" in data
                 success = has_message
                 self.log_test("JSON File Upload", success, f"Added {data.get('chunks_added', 0)} chunks")
             else:
@@ -277,10 +287,10 @@ Office C,2000,4000,Yes"""
             for _, (_, file_obj, _) in files:
                 file_obj.close()
                 
-            success = response.status_code == 200
+            success = response.status_code == 202
             if success:
-                data = response.json()
-                has_message = "message" in data and "2 file" in data["message"]
+                data = self.wait_for_upload_job(response.json()["job_id"])
+                has_message = data["files_total"] == 2 and data["status"] == "completed"
                 success = has_message
                 self.log_test("Multiple File Upload", success, f"Processed {data.get('files_processed', 0)} files")
             else:
@@ -0,0 +1,93 @@
+import os
+import pandas as pd
+import pytest
+
+from app.dataset import DatasetSnapshot
+from app.property_store import open_sqlite_dataset
+
+CSV_PATH = "data/HackathonInternalKnowledgeBase.csv"
+
+FILTERS = [
+    {},
+    {"Size (SF)": {"gt": 10000}},
+    {"Rent/SF/Year": {"gte": 90, "lt": 110}, "Size (SF)": {"lte": 20000}},
+    {"Associate 1": {"eq": "Jack Sparrow"}},
+    {"GCI On 3 Years": {"gt": 10 ** 9}},  # no matches
+    {"Not A Column": {"gt": 1}},  # ignored by both backends
+]
+
+AGGREGATIONS = [
+    ([], {"Size (SF)": ["sum", "mean", "count", "min", "max"]}),
+    (["Associate 1"], {"Size (SF)": ["sum", "mean"], "Monthly Rent": ["max", "min", "count"]}),
+    (["Associate 1"], {"Rent/SF/Year": ["p50", "p90", "mean"]}),
+    ([], {"GCI On 3 Years": ["p25", "p99.5"]}),
+]
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    """The same small CSV (with a few empty cells) loaded into both backends"""
+    directory = tmp_path_factory.mktemp("properties")
+    path = str(directory / "properties.csv")
+    df = pd.read_csv(CSV_PATH, nrows=60)
+    df.loc[3, "Associate 2"] = None
+    df.loc[7, "Monthly Rent"] = None
+    df.loc[11, "Size (SF)"] = None
+    df.to_csv(path, index=False)
+
+    snapshot = DatasetSnapshot(pd.read_csv(path), 1, path, os.path.getmtime(path))
+    sqlite = open_sqlite_dataset(path, db_path=str(directory / "properties.db"))
+    return snapshot, sqlite
+
+def assert_same_frame(actual: pd.DataFrame, expected: pd.DataFrame):
+    actual = actual.reset_index(drop=True)
+    expected = expected.reset_index(drop=True)
+    assert list(actual.columns) == list(expected.columns)
+    assert len(actual) == len(expected)
+    for column in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[column]):
+            pd.testing.assert_series_equal(actual[column].astype(float), expected[column].astype(float),
+                                           check_names=False, rtol=1e-9)
+        else:
+            # Missing text comes back as None from SQLite and NaN from pandas
+            assert actual[column].where(actual[column].notna(), None).tolist() == \
+                expected[column].where(expected[column].notna(), None).tolist()
+
+def test_shape(backends):
+    snapshot, sqlite = backends
+    assert sqlite.columns == snapshot.columns
+    assert sqlite.row_count == snapshot.row_count
+    assert not sqlite.empty
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filter(backends, filters):
+    snapshot, sqlite = backends
+    assert_same_frame(sqlite.filter(filters), snapshot.filter(filters))
+    columns = ["Property Address", "Size (SF)", "Monthly Rent"]
+    assert_same_frame(sqlite.filter(filters, columns), snapshot.filter(filters, columns))
+
+@pytest.mark.parametrize("filters", FILTERS[:3])
+def test_iter_filtered(backends, filters):
+    snapshot, sqlite = backends
+    chunks = list(sqlite.iter_filtered(filters, 7))
+    assert all(len(chunk) <= 7 for chunk in chunks)
+    assert_same_frame(pd.concat(chunks), pd.concat(snapshot.iter_filtered(filters, 7)))
+
+@pytest.mark.parametrize("group_by, metrics", AGGREGATIONS)
+@pytest.mark.parametrize("filters", FILTERS[:3])
+def test_aggregate(backends, group_by, metrics, filters):
+    """Plain aggregates (SQL GROUP BY) and percentiles match pandas, groups in first-appearance order"""
+    snapshot, sqlite = backends
+    assert_same_frame(sqlite.aggregate(group_by, metrics, filters), snapshot.aggregate(group_by, metrics, filters))
+
+def test_describe(backends):
+    snapshot, sqlite = backends
+    columns = ["Size (SF)", "Rent/SF/Year", "Monthly Rent", "GCI On 3 Years"]
+    expected = snapshot.describe(columns)
+    actual = sqlite.describe(columns)
+    assert actual.keys() == expected.keys()
+    for column in columns:
+        for stat in ("mean", "min", "max"):
+            assert actual[column][stat] == pytest.approx(expected[column][stat], rel=1e-9)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,54 @@
+import pytest
+
+from app.rag import KnowledgeBase
+from app.response_cache import chat_response_cache, cache_key, is_follow_up
+
+@pytest.fixture
+def kb(tmp_path):
+    kb = KnowledgeBase("test", str(tmp_path))
+    kb.add_document_batch([([
+        "Suite 100 at 1 Times Square rents for 90 dollars per square foot",
+        "Suite 200 on Broadway is handled by Jack Sparrow",
+    ], "suites.txt", 100, "hash-suites")])
+    return kb
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    chat_response_cache.clear()
+    yield
+    chat_response_cache.clear()
+
+def key_for(kb, question):
+    generation, chunk_ids, _ = kb.query_with_ids(question)
+    return cache_key(kb.namespace, generation, question, chunk_ids)
+
+def test_repeat_question_hits(kb):
+    """The same question, however it is cased or punctuated, is answered from the cache"""
+    assert chat_response_cache.get(key_for(kb, "Who handles Broadway?")) is None
+    chat_response_cache.put(key_for(kb, "Who handles Broadway?"), "Jack Sparrow")
+    assert chat_response_cache.get(key_for(kb, "  who handles   broadway ")) == "Jack Sparrow"
+
+def test_generation_change_misses(kb):
+    """After an upload changes the knowledge base, the old answer is not served"""
+    question = "Who handles Broadway?"
+    old_key = key_for(kb, question)
+    chat_response_cache.put(old_key, "Jack Sparrow")
+
+    kb.add_document_batch([(["Suite 300 on Broadway is handled by Will Turner"], "more.txt", 50, "hash-more")])
+    new_key = key_for(kb, question)
+    assert new_key != old_key
+    assert chat_response_cache.get(new_key) is None
+    assert chat_response_cache.get(old_key) == "Jack Sparrow"
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the rent at 1 Times Square?", False),
+    ("Which suites are on Broadway?", False),
+    ("What about the second one?", True),
+    ("And on 5th Avenue?", True),
+    ("Who handles it?", True),
+])
+def test_follow_up_questions(question, expected):
+    assert is_follow_up(question) is expected
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
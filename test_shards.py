@@ -0,0 +1,51 @@
+import random
+import numpy as np
+import pytest
+
+from app import rag
+from app.rag import normalize_rows
+from app.shards import ShardedIndex, assign_shards
+
+WORDS = (
+    "suite floor rent broadway avenue square midtown lease tenant office retail "
+    "commission broker annual monthly corner lobby elevator parking renovated"
+).split()
+
+@pytest.fixture(scope="module")
+def kb(tmp_path_factory):
+    rng = random.Random(7)
+    documents = []
+    for doc in range(12):
+        chunks = [f"chunk {doc}-{i} " + " ".join(rng.choices(WORDS, k=rng.randint(4, 12))) for i in range(25)]
+        documents.append((chunks, f"doc{doc}.txt", 100, f"hash-{doc}"))
+    # Build the LSA vectors too so dense and hybrid scoring can be compared
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(rag, "RETRIEVAL_MODE", "hybrid")
+        # Unsharded scoring is the reference
+        mp.setattr(rag, "RETRIEVAL_SHARDS", 1)
+        kb = rag.KnowledgeBase("test", str(tmp_path_factory.mktemp("kb")))
+        kb.add_document_batch(documents)
+    assert kb.index.dense_vectors is not None and kb.index.sharded_index is None
+    return kb
+
+@pytest.mark.parametrize("mode", ["lexical", "dense", "hybrid"])
+@pytest.mark.parametrize("shards", [2, 4, 7])
+@pytest.mark.parametrize("query", ["rent on broadway", "renovated corner office with parking", "midtown lease"])
+def test_sharded_search_matches_unsharded(kb, mode, shards, query):
+    """Merging per-shard top k gives the same chunks and scores as scoring the whole index"""
+    k = 10
+    expected_ids, expected_scores = kb.rank_chunks(query, k, mode)
+
+    reference = kb.index
+    index = ShardedIndex(reference.tfidf_matrix, reference.dense_vectors,
+                         assign_shards(kb.documents.chunk_owners, shards), shards)
+    assert len(index) > 1
+    query_vector = reference.vectorizer.transform([query])
+    query_dense = None if mode == "lexical" else normalize_rows(reference.lsa_model.transform(query_vector))[0]
+    ids, scores = index.search(query_vector, query_dense, mode, k)
+
+    assert ids.tolist() == np.asarray(expected_ids).tolist()
+    assert np.allclose(scores, expected_scores)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
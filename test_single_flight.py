@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+from app.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_computation():
+    """Overlapping calls with one key run the computation once and all get its result"""
+    flights = SingleFlight()
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def main():
+        return await asyncio.gather(*(flights.run("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(runs) == 1
+    assert [result for result, _ in results] == [{"answer": 42}] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+def test_different_keys_and_later_calls_run_separately():
+    """Only overlapping calls with equal keys are coalesced; finished keys are forgotten"""
+    flights = SingleFlight()
+    runs = []
+
+    async def compute(value):
+        runs.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        first = await asyncio.gather(flights.run("a", lambda: compute("a")), flights.run("b", lambda: compute("b")))
+        again = await flights.run("a", lambda: compute("a again"))
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert first == [("a", False), ("b", False)]
+    assert again == ("a again", False)
+    assert runs == ["a", "b", "a again"]
+
+def test_exception_reaches_every_caller():
+    """A failed computation raises in every caller and is not remembered"""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(flights.run("key", fail) for _ in range(3)), return_exceptions=True)
+        return results, await flights.run("key", lambda: asyncio.sleep(0, result="recovered"))
+
+    results, retry = asyncio.run(main())
+    assert all(isinstance(error, ValueError) and str(error) == "boom" for error in results)
+    assert retry == ("recovered", False)
+    assert flights.stats()["in_flight"] == 0
+
+def test_cancelled_caller_does_not_cancel_shared_computation():
+    """A caller that goes away leaves the computation running for the others"""
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("key", compute))
+        second = asyncio.ensure_future(flights.run("key", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == ("done", True)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])